@@ -1,49 +1,105 @@
+import csv
+import json
+import os
+import time
+
 from model import Model
+from snapshot import OrderSnapshot
 from view import View
 
+# File keeping the position of an interrupted batched delete
+DELETE_PROGRESS_FILE = "delete_progress.json"
+
+# Maximum number of rows returned by indexed text searches
+SEARCH_LIMIT = 100
+
+# Read rows for a bulk update from a CSV file with a header row or a JSON lines file
+def read_rows(f, path):
+    if path.endswith(".jsonl"):
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        for row in csv.DictReader(f):
+            # Empty CSV fields are NULLs
+            yield {column: (value if value != "" else None) for column, value in row.items()}
+
 # Controller class to connect the model and view, managing the application's operations
 class Controller:
-    def __init__(self, db_name, user, password, host):
+    def __init__(self, db_name, user, password, host, replicas=None, replica_strategy="round_robin", max_replica_lag=5.0, statement_timeouts=None, snapshot_dir=None, plan_cost_threshold=None, plan_rows_threshold=None, cache_results=False, result_cache_dir=None, result_cache_max_bytes=64 * 1024 * 1024, shards=1, columnar_rows_threshold=None):
         # Initialize model and view objects
-        self.model = Model(db_name, user, password, host)
+        self.model = Model(db_name, user, password, host, replicas, replica_strategy, max_replica_lag, statement_timeouts, result_cache_dir, result_cache_max_bytes, shards)
         self.view = View()
+        # Optional local snapshot of orders answering the analytics queries in-process
+        self.snapshot = OrderSnapshot(self.model, snapshot_dir) if snapshot_dir is not None else None
+        # Queries whose estimated cost or row count exceeds these thresholds need confirmation
+        self.plan_cost_threshold = plan_cost_threshold
+        self.plan_rows_threshold = plan_rows_threshold
+        # View Data and Find Data results estimated above this many rows are fetched column by column
+        self.columnar_rows_threshold = columnar_rows_threshold
+        # Whether plans are shown before queries run: "off", "plan" (estimates) or "analyze" (actual rows and times)
+        self.explain_mode = "off"
+        # Cache read results, invalidated by change notifications from all instances
+        if cache_results:
+            self.model.start_listener()
 
     # Main loop to run the application
     def run(self):
+        if self.snapshot is not None:
+            self.refresh_snapshot()  # Pull orders added since the last run
         while True:
             self.show_tables()  # Display available tables
             choice = self.show_menu()  # Show menu and get user's choice
-            if choice == "1":
-                self.insert_data()
-            elif choice == "2":
-                self.view_data()
-            elif choice == "3":
-                self.update_data()
-            elif choice == "4":
-                self.delete_data()
-            elif choice == "5":
-                self.create_table()
-            elif choice == "6":
-                self.drop_table()
-            elif choice == "7":
-                self.generate_random_data()
-            elif choice == "8":
-                self.find_data()
-            elif choice == "9":
-                a = self.show_algorithms()  # Show algorithms submenu
-                if a == "1":
-                    self.pay_systems_total_income()
-                elif a == "2":
-                    self.company_orders_thru_period()
-                elif a == "3":
-                    self.top_5_orders_total_price()
-                elif a == "0":
-                    continue  # Return to main menu
-            elif choice == "0":
-                break  # Exit the application
-            else:
-                self.view.show_message("Invalid choice!")
-                
+            try:
+                if choice == "1":
+                    self.insert_data()
+                elif choice == "2":
+                    self.view_data()
+                elif choice == "3":
+                    self.update_data()
+                elif choice == "4":
+                    self.delete_data()
+                elif choice == "5":
+                    self.create_table()
+                elif choice == "6":
+                    self.drop_table()
+                elif choice == "7":
+                    self.generate_random_data()
+                elif choice == "8":
+                    self.find_data()
+                elif choice == "9":
+                    a = self.show_algorithms()  # Show algorithms submenu
+                    if a == "1":
+                        self.pay_systems_total_income()
+                    elif a == "2":
+                        self.company_orders_thru_period()
+                    elif a == "3":
+                        self.top_5_orders_total_price()
+                    elif a == "4":
+                        self.refresh_snapshot()
+                    elif a == "5":
+                        self.refresh_snapshot(full=True)
+                    elif a == "0":
+                        continue  # Return to main menu
+                elif choice == "10":
+                    self.copy_random_data()
+                elif choice == "11":
+                    self.bulk_update()
+                elif choice == "12":
+                    self.create_search_index()
+                elif choice == "13":
+                    self.explain_mode = self.view.get_explain_mode_input()
+                elif choice == "14":
+                    self.install_change_notifications()
+                elif choice == "0":
+                    self.model.stop_listener()
+                    break  # Exit the application
+                else:
+                    self.view.show_message("Invalid choice!")
+            except KeyboardInterrupt:
+                # Running queries are canceled on the server, go back to the menu
+                self.view.show_message("\nOperation canceled.")
+
     # Display available tables
     def show_tables(self):
         tables = self.model.get_tables()  # Fetch tables from the database
@@ -62,6 +118,11 @@ class Controller:
         self.view.show_message("7. Generate Random Data")
         self.view.show_message("8. Find Data")
         self.view.show_message("9. Algorithms")
+        self.view.show_message("10. Generate Random Data (fast COPY)")
+        self.view.show_message("11. Bulk Update From File")
+        self.view.show_message("12. Create Search Index")
+        self.view.show_message(f"13. Explain Mode (current: {self.explain_mode})")
+        self.view.show_message("14. Install Change Notifications")
         self.view.show_message("0. Quit")
         return input("Enter your choice: ")
     
@@ -71,9 +132,46 @@ class Controller:
         self.view.show_message("1. Pay Systems' Total Income")
         self.view.show_message("2. Company's Orders' thru Period")
         self.view.show_message("3. Top 5 Orders' Total Price")
+        if self.snapshot is not None:
+            self.view.show_message("4. Refresh Local Snapshot")
+            self.view.show_message("5. Rebuild Local Snapshot")
         self.view.show_message("0. Quit")
         return input("Enter your choice: ")
         
+    # Show the plan of a query and check its estimates before it runs, returns False if the user cancels it
+    def inspect_query(self, query):
+        thresholds = self.plan_cost_threshold is not None or self.plan_rows_threshold is not None
+        if self.explain_mode == "off" and not thresholds:
+            return True
+
+        plan = self.model.explain(query)  # Estimated plan, the query is not run
+        if plan is None:
+            return True  # Let the query itself report the error
+        if self.explain_mode == "plan":
+            self.view.show_plan(plan)
+
+        too_costly = self.plan_cost_threshold is not None and plan["Total Cost"] > self.plan_cost_threshold
+        too_many_rows = self.plan_rows_threshold is not None and plan["Plan Rows"] > self.plan_rows_threshold
+        if too_costly or too_many_rows:
+            self.view.show_message(f"Warning: estimated cost {plan['Total Cost']:.0f}, estimated rows {plan['Plan Rows']}.")
+            if self.view.get_confirmation("Run the query anyway? (yes/no): ").lower() != "yes":
+                self.view.show_message("Query canceled.")
+                return False
+
+        if self.explain_mode == "analyze":
+            self.view.show_message("Running the query under EXPLAIN ANALYZE, it runs again afterwards for its result.")
+            plan = self.model.explain(query, analyze=True)  # Runs the query to measure it
+            if plan is not None:
+                self.view.show_plan(plan)
+        return True
+
+    # Check whether a query is estimated to return enough rows to be fetched column by column
+    def use_columnar(self, query):
+        if self.columnar_rows_threshold is None:
+            return False
+        plan = self.model.explain(query)  # Estimated plan, the query is not run
+        return plan is not None and plan["Plan Rows"] > self.columnar_rows_threshold
+
     # Insert data into a table
     def insert_data(self):
         table, columns, data = self.view.get_insert_input()
@@ -93,7 +191,10 @@ class Controller:
         self.view.show_message(f"Available columns: {', '.join(columns)}")
         selected_columns = self.view.get_columns_input()  # Get desired columns from the user
         condition = self.view.get_condition_input()  # Get condition from the user
-        data = self.model.get_data(table, selected_columns, condition)  # Fetch data from the database
+        query = self.model.get_data_query(table, selected_columns, condition)
+        if not self.inspect_query(query):
+            return
+        data = self.model.get_data(table, selected_columns, condition, columnar=self.use_columnar(query))  # Fetch data from the database
         if data is not None:
             self.view.show_data(data, selected_columns)  # Display the data
         else:
@@ -107,6 +208,22 @@ class Controller:
         else:
             self.view.show_message("Data update failed!")
 
+    # Update or upsert many rows read from a file
+    def bulk_update(self):
+        table, key, path, upsert = self.view.get_bulk_update_input()  # Get input from the user
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                start = time.perf_counter()
+                affected = self.model.bulk_update(table, key, read_rows(f, path), upsert)  # Attempt to update data
+                elapsed = time.perf_counter() - start
+        except OSError as e:
+            self.view.show_message(f"Unable to read file: {e}")
+            return
+        if affected is not None:
+            self.view.show_message(f"Data updated successfully! {affected} rows affected in {elapsed:.2f}s ({affected / max(elapsed, 1e-9):.0f} rows/sec)")
+        else:
+            self.view.show_message("Data update failed!")
+
     # Delete data from a table
     def delete_data(self):
         table = self.view.get_table_name()  # Get table name from the user
@@ -119,13 +236,48 @@ class Controller:
         
         condition = self.view.get_condition_input()  # Get condition from the user
         confirm = self.view.get_confirmation(f"Are you sure you want to delete rows matching condition: {condition}? (yes/no): ")
-        if confirm.lower() == "yes":
+        if confirm.lower() != "yes":
+            self.view.show_message("Delete operation canceled.")
+            return
+
+        batch_size, max_rows_per_sec = self.view.get_batched_delete_input()  # Get batching options from the user
+        if batch_size is None:
             if self.model.delete_data(table, condition):  # Attempt to delete data
                 self.view.show_message("Data deleted successfully!")
             else:
                 self.view.show_message("Data deletion failed!")
+            return
+
+        # Offer to continue an interrupted delete of the same rows
+        start_after = None
+        saved = self.load_delete_progress()
+        if saved is not None and saved["table"] == table and saved["condition"] == condition and saved["last_key"] is not None:
+            if self.view.get_confirmation(f"Resume the interrupted delete after key {saved['last_key']}? (yes/no): ").lower() == "yes":
+                start_after = saved["last_key"]
+
+        start = time.perf_counter()
+
+        # Report and save the position after each committed batch
+        def progress(deleted, last_key):
+            elapsed = time.perf_counter() - start
+            self.view.show_message(f"Deleted {deleted} rows ({deleted / max(elapsed, 1e-9):.0f} rows/sec)")
+            with open(DELETE_PROGRESS_FILE, "w") as f:
+                json.dump({"table": table, "condition": condition, "last_key": last_key}, f, default=str)
+
+        deleted = self.model.delete_data_batched(table, condition, batch_size, max_rows_per_sec, progress, start_after)  # Attempt to delete data
+        if deleted is not None:
+            if os.path.exists(DELETE_PROGRESS_FILE):
+                os.remove(DELETE_PROGRESS_FILE)
+            self.view.show_message(f"Data deleted successfully! {deleted} rows deleted.")
         else:
-            self.view.show_message("Delete operation canceled.")
+            self.view.show_message("Data deletion failed! Run the delete again to resume.")
+
+    # Read the position of an interrupted batched delete
+    def load_delete_progress(self):
+        if not os.path.exists(DELETE_PROGRESS_FILE):
+            return None
+        with open(DELETE_PROGRESS_FILE) as f:
+            return json.load(f)
 
             
     # Create a new table
@@ -152,19 +304,64 @@ class Controller:
         else:
             self.view.show_message("Random data generation failed!")
             
+    # Generate random data on the client and load it with COPY
+    def copy_random_data(self):
+        table, columns, data_types, parameters, rows_number, text_len = self.view.get_generate_random_input()  # Get input from the user
+        seed = self.view.get_seed_input()  # Get the seed for reproducible data
+        start = time.perf_counter()
+        if self.model.copy_random_data(table, columns, data_types, parameters, rows_number, text_len, seed):  # Attempt to generate and copy random data
+            elapsed = time.perf_counter() - start
+            self.view.show_message(f"Random data generated successfully! {rows_number} rows in {elapsed:.2f}s ({rows_number / max(elapsed, 1e-9):.0f} rows/sec)")
+        else:
+            self.view.show_message("Random data generation failed!")
+            
     # Find data based on specific conditions
     def find_data(self):
-        table, column, condition = self.view.get_find_input()  # Get input from the user
-        data = self.model.get_data(table, [column], condition)  # Fetch data from the database
+        table, column, condition, search = self.view.get_find_input()  # Get input from the user
+        if search is not None:
+            kind = self.model.get_search_index(table, column)  # Check for a search index on the column
+            if kind is not None:
+                data = self.model.search_data(table, column, search, kind, SEARCH_LIMIT)  # Ranked search through the index
+                if data is not None:
+                    self.view.show_data(data, [column, "rank"])  # Display the data
+                else:
+                    self.view.show_message("Data retrieval failed!")
+                return
+        query = self.model.get_data_query(table, [column], condition)
+        if not self.inspect_query(query):
+            return
+        data = self.model.get_data(table, [column], condition, columnar=self.use_columnar(query))  # Fetch data from the database
         if data is not None:
             self.view.show_data(data, [column])  # Display the data
         else:
             self.view.show_message("Data retrieval failed!")
             
+    # Create a search index for a text column
+    def create_search_index(self):
+        table, column, kind = self.view.get_search_index_input()  # Get input from the user
+        if self.model.create_search_index(table, column, kind):  # Attempt to create the index
+            self.view.show_message("Search index created successfully!")
+        else:
+            self.view.show_message("Search index creation failed!")
+            
+    # Install the triggers notifying all instances about changes of every table
+    def install_change_notifications(self):
+        tables = self.model.get_tables()  # Fetch tables from the database
+        if tables is None:
+            self.view.show_message("Failed to retrieve tables.")
+            return
+        tables = [f'"{table[0]}"' for table in tables]  # Quote names such as "order"
+        if self.model.install_change_notifications(tables):  # Attempt to install the triggers
+            self.view.show_message("Change notifications installed successfully!")
+        else:
+            self.view.show_message("Change notifications installation failed!")
+            
     # Calculate total income for payment systems
     def pay_systems_total_income(self):
         left, right = self.view.get_pay_systems_total_income_input()  # Get input from the user
-        data = self.model.pay_systems_total_income(left, right)  # Fetch the data
+        if self.snapshot is None and not self.inspect_query(self.model.pay_systems_total_income_query(left, right)):
+            return
+        data = (self.snapshot or self.model).pay_systems_total_income(left, right)  # Fetch the data
         if data is not None:
             self.view.show_data(data, ["id", "name", "count", "total_income"])  # Display the data
         else:
@@ -173,7 +370,9 @@ class Controller:
     # Get company orders within a specific period
     def company_orders_thru_period(self):
         left, right = self.view.get_company_orders_thru_period_input()  # Get input from the user
-        data = self.model.company_orders_thru_period(left, right)  # Fetch the data
+        if self.snapshot is None and not self.inspect_query(self.model.company_orders_thru_period_query(left, right)):
+            return
+        data = (self.snapshot or self.model).company_orders_thru_period(left, right)  # Fetch the data
         if data is not None:
             self.view.show_data(data, ["id", "company", "orders"])  # Display the data
         else:
@@ -182,8 +381,21 @@ class Controller:
     # Find the top 5 orders by total price for a specific company
     def top_5_orders_total_price(self):
         company = self.view.get_top_5_orders_total_price_input()  # Get input from the user
-        data = self.model.top_5_orders_total_price(company)  # Fetch the data
+        if self.snapshot is None and not self.inspect_query(self.model.top_5_orders_total_price_query(company)):
+            return
+        data = (self.snapshot or self.model).top_5_orders_total_price(company)  # Fetch the data
         if data is not None:
             self.view.show_data(data, ["order_id", "total_price"])  # Display the data
         else:
             self.view.show_message("Data retrieval failed!")
+            
+    # Bring the local snapshot of orders up to date, or rebuild it from scratch
+    def refresh_snapshot(self, full=False):
+        if self.snapshot is None:
+            self.view.show_message("Local snapshot is disabled.")
+            return
+        pulled = self.snapshot.refresh(full)  # Rebuilt automatically if orders were updated or deleted
+        if pulled is not None:
+            self.view.show_message(f"Snapshot refreshed: {pulled} orders added, {self.snapshot.rows} in total.")
+        else:
+            self.view.show_message("Snapshot refresh failed!")
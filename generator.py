@@ -0,0 +1,312 @@
+import io
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+# Header and trailer of the PostgreSQL binary COPY format
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+
+# PostgreSQL stores dates and timestamps relative to 2000-01-01
+PG_EPOCH_DATE = np.datetime64("2000-01-01", "D")
+PG_EPOCH_TIMESTAMP = np.datetime64("2000-01-01T00:00:00", "us")
+
+# Binary wire formats of the column types that can be sent with binary COPY
+BINARY_FORMATS = {
+    "smallint": ">i2",
+    "integer": ">i4",
+    "bigint": ">i8",
+    "real": ">f4",
+    "double precision": ">f8",
+    "boolean": "u1",
+    "date": ">i4",
+    "timestamp without time zone": ">i8",
+    "time without time zone": ">i8",
+}
+
+TEXT_TYPES = ("text", "character varying", "character")
+INTEGER_TYPES = ("smallint", "integer", "bigint")
+
+# Value ranges of the integer types, values outside them would wrap around when packed
+INTEGER_RANGES = {
+    "smallint": (-2**15, 2**15 - 1),
+    "integer": (-2**31, 2**31 - 1),
+    "bigint": (-2**63, 2**63 - 1),
+}
+
+
+def parse_time(value: str) -> int:
+    """
+    This function is used to convert a time string (HH:MM[:SS]) into microseconds since midnight.
+
+    Parameters:
+    value (str): The time string.
+
+    Returns:
+    int: The number of microseconds since midnight.
+    """
+    parts = [float(part) for part in value.split(":")]
+    parts += [0.0] * (3 - len(parts))
+    hours, minutes, seconds = parts
+    return int(round((hours * 3600 + minutes * 60 + seconds) * 1_000_000))
+
+
+def generate_column(rng: np.random.Generator, data_type: str, parameter: tuple, size: int, text_len=1, fk_pool=None) -> np.ndarray:
+    """
+    This function is used to generate one batch of random values for a single column.
+
+    Parameters:
+    rng (numpy.random.Generator): The random generator (seeded for reproducible runs).
+    data_type (str): The generator type. Possible values:
+        - int (min, max): uniform integers
+        - float (min, max): uniform floats
+        - normal (mean, std): normally distributed floats
+        - zipf (a, max): Zipf distributed integers in [1, max]
+        - categorical (value[:weight], ...): values picked with optional weights
+        - text (min char code, max char code): strings of text_len characters
+        - date (YYYY-MM-DD, YYYY-MM-DD)
+        - time (HH:MM:SS, HH:MM:SS)
+        - timestamp (YYYY-MM-DD/HH:MM:SS, YYYY-MM-DD/HH:MM:SS)
+        - bool
+        - fk_int (parent table, parent column): values picked from fk_pool
+    parameter (tuple): The parameters of the generator, as entered in the View.
+    size (int): The number of values to generate.
+    text_len (int, optional): The length of the text to be generated. Ignored if data_type is not text.
+    fk_pool (numpy.ndarray, optional): The existing parent key values. Required if data_type is fk_int.
+
+    Returns:
+    numpy.ndarray: The generated values.
+    """
+    if data_type == "int":
+        min_value, max_value = (int(value) for value in parameter)
+        return rng.integers(min_value, max_value + 1, size=size)
+
+    if data_type == "float":
+        min_value, max_value = (float(value) for value in parameter)
+        return rng.uniform(min_value, max_value, size=size)
+
+    if data_type == "normal":
+        mean, std = (float(value) for value in parameter)
+        return rng.normal(mean, std, size=size)
+
+    if data_type == "zipf":
+        # Sample ranks 1..max with probability proportional to rank^-a, so the support stays bounded
+        a, max_value = float(parameter[0]), int(parameter[1])
+        ranks = np.arange(1, max_value + 1)
+        weights = ranks ** -a
+        return rng.choice(ranks, size=size, p=weights / weights.sum())
+
+    if data_type == "categorical":
+        values, weights = [], []
+        for item in parameter:
+            value, _, weight = item.partition(":")
+            values.append(value)
+            weights.append(float(weight) if weight else 1.0)
+        weights = np.array(weights)
+        return rng.choice(np.array(values), size=size, p=weights / weights.sum())
+
+    if data_type == "text":
+        min_value, max_value = (int(value) for value in parameter)
+        codes = rng.integers(min_value, max_value + 1, size=(size, max(text_len, 1)), dtype=np.uint32)
+        # Reinterpret each row of character codes as one fixed-width unicode string
+        return codes.view(f"<U{max(text_len, 1)}").ravel()
+
+    if data_type == "date":
+        min_value, max_value = (np.datetime64(value, "D") for value in parameter)
+        days = rng.integers(0, (max_value - min_value).astype(int) + 1, size=size)
+        return min_value + days.astype("timedelta64[D]")
+
+    if data_type == "time":
+        min_value, max_value = (parse_time(value) for value in parameter)
+        return rng.integers(min_value, max_value + 1, size=size)
+
+    if data_type == "timestamp":
+        min_value, max_value = (np.datetime64(value.replace("/", "T"), "s") for value in parameter)
+        seconds = rng.integers(0, (max_value - min_value).astype(int) + 1, size=size)
+        return min_value + seconds.astype("timedelta64[s]")
+
+    if data_type == "bool":
+        return rng.random(size) < 0.5
+
+    if data_type == "fk_int":
+        if fk_pool is None or len(fk_pool) == 0:
+            raise ValueError(f"No parent values available for foreign key {parameter}")
+        return fk_pool[rng.integers(0, len(fk_pool), size=size)]
+
+    raise ValueError(f"Unsupported data type '{data_type}'")
+
+
+def coerce_column(values: np.ndarray, data_type: str, pg_type: str) -> np.ndarray:
+    """
+    This function is used to convert generated values into the representation expected by the target column.
+    Integer values that do not fit in the target type raise a ValueError.
+
+    Parameters:
+    values (numpy.ndarray): The generated values.
+    data_type (str): The generator type the values were produced with.
+    pg_type (str): The PostgreSQL base type of the target column (format_type without the type modifier).
+
+    Returns:
+    numpy.ndarray: The converted values. Temporal columns are returned as int64 offsets
+    (days or microseconds since 2000-01-01, microseconds since midnight for time).
+    """
+    if pg_type in INTEGER_TYPES:
+        if values.dtype.kind in "US":
+            # Categorical values are strings, values beyond int64 fail here
+            values = values.astype(np.int64)
+        if values.dtype.kind == "f":
+            values = np.rint(values)
+        # Check before converting, so that neither the int64 conversion nor the packing can wrap around
+        low, high = INTEGER_RANGES[pg_type]
+        if len(values) and (values.min() < low or values.max() > high):
+            raise ValueError(f"Values between {values.min()} and {values.max()} are out of range for type {pg_type}")
+        return values.astype(np.int64)
+
+    if pg_type in ("real", "double precision"):
+        return values.astype(np.float64)
+
+    if pg_type == "boolean":
+        if values.dtype.kind in "US":
+            return np.isin(np.char.lower(values.astype(str)), ("true", "t", "1", "yes"))
+        return values.astype(bool)
+
+    if pg_type == "date":
+        return (values.astype("datetime64[D]") - PG_EPOCH_DATE).astype(np.int64)
+
+    if pg_type == "timestamp without time zone":
+        return (values.astype("datetime64[us]") - PG_EPOCH_TIMESTAMP).astype(np.int64)
+
+    if pg_type == "time without time zone":
+        if values.dtype.kind in "US":
+            return np.array([parse_time(value) for value in values], dtype=np.int64)
+        return values.astype(np.int64)
+
+    if pg_type in TEXT_TYPES:
+        return values.astype(str)
+
+    return values
+
+
+def encode_binary_copy(columns: List[np.ndarray], pg_types: List[str]) -> bytes:
+    """
+    This function is used to encode a batch of coerced columns as a binary COPY stream.
+
+    If every column has a fixed width (including text columns whose values all have the same
+    encoded length) the rows are packed with a single NumPy structured array, otherwise each
+    row is joined from its pre-encoded fields.
+
+    Parameters:
+    columns (list): A list of coerced column arrays of equal length (see coerce_column).
+    pg_types (list): The PostgreSQL types of the columns.
+
+    Returns:
+    bytes: The complete COPY stream including header and trailer.
+    """
+    rows_number = len(columns[0]) if columns else 0
+    fields = []
+    for values, pg_type in zip(columns, pg_types):
+        if pg_type in TEXT_TYPES:
+            encoded = np.char.encode(values, "utf-8")
+            lengths = np.char.str_len(encoded)
+            width = int(lengths.max()) if rows_number else 0
+            if rows_number and int(lengths.min()) == width:
+                fields.append((f"S{width}" if width else "V0", encoded, width))
+            else:
+                fields.append((None, encoded, None))
+        else:
+            fmt = BINARY_FORMATS[pg_type]
+            fields.append((fmt, values, np.dtype(fmt).itemsize))
+
+    dtype = [("count", ">i2")]
+    for i, (fmt, _, _) in enumerate(fields):
+        dtype += [(f"len{i}", ">i4"), (f"val{i}", fmt or "V0")]
+
+    packed = np.zeros(rows_number, dtype=dtype)
+    packed["count"] = len(fields)
+    for i, (fmt, values, width) in enumerate(fields):
+        if fmt is not None:
+            packed[f"len{i}"] = width
+            if width:
+                packed[f"val{i}"] = values
+
+    if all(fmt is not None for fmt, _, _ in fields):
+        return COPY_HEADER + packed.tobytes() + COPY_TRAILER
+
+    # Variable-width text: split the packed rows around each variable column and join per row
+    parts = []
+    start = 0
+    for i, (fmt, values, _) in enumerate(fields):
+        if fmt is None:
+            end = packed.dtype.fields[f"len{i}"][1]
+            parts.append(_row_slices(packed, start, end))
+            parts.append([struct.pack(">i", len(value)) + value for value in values.tolist()])
+            start = end + 4
+    parts.append(_row_slices(packed, start, packed.dtype.itemsize))
+
+    buffer = io.BytesIO()
+    buffer.write(COPY_HEADER)
+    for row in zip(*parts):
+        buffer.write(b"".join(row))
+    buffer.write(COPY_TRAILER)
+    return buffer.getvalue()
+
+
+def _row_slices(packed: np.ndarray, start: int, end: int) -> list:
+    # Cut the byte range [start, end) out of every packed row
+    raw = packed.view(np.uint8).reshape(len(packed), packed.dtype.itemsize)
+    return raw[:, start:end].copy().view(f"V{end - start}").ravel().tolist() if end > start else [b""] * len(packed)
+
+
+def encode_text_copy(columns: List[np.ndarray], pg_types: List[str]) -> bytes:
+    """
+    This function is used to encode a batch of coerced columns as a text COPY stream.
+    It is the fallback for column types that have no binary encoder (e.g. numeric).
+
+    Parameters:
+    columns (list): A list of coerced column arrays of equal length (see coerce_column).
+    pg_types (list): The PostgreSQL types of the columns.
+
+    Returns:
+    bytes: The COPY stream in text format.
+    """
+    escapes = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+    text_columns = []
+    for values, pg_type in zip(columns, pg_types):
+        if pg_type == "date":
+            values = (PG_EPOCH_DATE + values.astype("timedelta64[D]")).astype(str)
+        elif pg_type == "timestamp without time zone":
+            values = (PG_EPOCH_TIMESTAMP + values.astype("timedelta64[us]")).astype(str)
+        elif pg_type == "time without time zone":
+            values = np.char.partition((PG_EPOCH_TIMESTAMP + values.astype("timedelta64[us]")).astype(str), "T")[:, 2]
+        text_columns.append([str(value).translate(escapes) for value in values.tolist()])
+
+    lines = ["\t".join(row) for row in zip(*text_columns)]
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+
+def build_copy_batch(rng: np.random.Generator, data_types: list, parameters: list, pg_types: list, size: int, text_len=1, fk_pools=None) -> Tuple[bytes, bool]:
+    """
+    This function is used to generate and encode one batch of rows for COPY.
+
+    Parameters:
+    rng (numpy.random.Generator): The random generator.
+    data_types (list): The generator types of the columns (see generate_column).
+    parameters (list): The generator parameters of the columns.
+    pg_types (list): The PostgreSQL types of the target columns.
+    size (int): The number of rows in the batch.
+    text_len (int, optional): The length of the generated text values.
+    fk_pools (dict, optional): Parent key values keyed by column position, for fk_int columns.
+
+    Returns:
+    (bytes, bool): The encoded batch and True if it is in binary format, False if in text format.
+    """
+    fk_pools = fk_pools or {}
+    columns = []
+    for i, (data_type, parameter, pg_type) in enumerate(zip(data_types, parameters, pg_types)):
+        values = generate_column(rng, data_type, parameter, size, text_len, fk_pools.get(i))
+        columns.append(coerce_column(values, data_type, pg_type))
+
+    if all(pg_type in BINARY_FORMATS or pg_type in TEXT_TYPES for pg_type in pg_types):
+        return encode_binary_copy(columns, pg_types), True
+    return encode_text_copy(columns, pg_types), False
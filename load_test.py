@@ -0,0 +1,253 @@
+import argparse
+import concurrent.futures
+import datetime
+import random
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import main
+from model import Model
+from view import View
+
+# Default weights of the operations in the workload
+DEFAULT_MIX = {
+    "insert_data": 10,
+    "get_data": 40,
+    "update_data": 20,
+    "delete_data": 5,
+    "pay_systems_total_income": 10,
+    "company_orders_thru_period": 10,
+    "top_5_orders_total_price": 5,
+}
+
+# Operations that change the database, only run with --allow-writes
+WRITE_OPERATIONS = ("insert_data", "update_data", "delete_data")
+
+def create_model(db_name: Optional[str] = None) -> Model:
+    # Same settings as the application (replicas, timeouts, result cache, shards), optionally against another database.
+    # The in-process cache is not used, it needs the change listener started by the application (CACHE_RESULTS)
+    return Model(db_name or main.DB_NAME, main.USER, main.PASSWORD, main.HOST, main.REPLICAS, main.REPLICA_STRATEGY, main.MAX_REPLICA_LAG, main.STATEMENT_TIMEOUTS,
+                 main.RESULT_CACHE_DIR, main.RESULT_CACHE_MAX_BYTES, main.AGGREGATION_SHARDS)
+
+def load_pools(model: Model) -> dict:
+    """
+    This function is used to read the keys and names the generated operations refer to.
+
+    Parameters:
+    model (Model): The model used to read from the database.
+
+    Returns:
+    dict: Company ids and names, pay system ids and the highest order id.
+    """
+    companies = model.get_data("company", ["id", "name"]) or []
+    pay_systems = model.get_data("pay_system", ["id"]) or []
+    max_id = model.get_data('"order"', ["MAX(id)"]) or [(None,)]
+    return {
+        "company_ids": [row[0] for row in companies],
+        "company_names": [row[1] for row in companies],
+        "pay_system_ids": [row[0] for row in pay_systems],
+        "max_order_id": max_id[0][0] or 1,
+    }
+
+def run_operation(model: Model, operation: str, pools: dict, rng: random.Random) -> bool:
+    """
+    This function is used to run one operation of the workload with random arguments.
+
+    Parameters:
+    model (Model): The model used to run the operation.
+    operation (str): The name of the Model method.
+    pools (dict): The keys and names returned by load_pools.
+    rng (random.Random): The random generator of the worker.
+
+    Returns:
+    bool: True if the operation succeeded, False otherwise.
+    """
+    order_id = rng.randint(1, pools["max_order_id"])
+    day = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 1460))
+
+    if operation == "insert_data":
+        data = [rng.choice(pools["company_ids"]), rng.choice(pools["pay_system_ids"]), rng.randint(1, 10000), str(day)]
+        return model.insert_data('"order"', ["company_id", "pay_system_id", "sum", "date"], data)
+    if operation == "get_data":
+        # get_data returns None for errors and for empty results, so read an order that exists:
+        # the first one from the random id, or the last one if the orders above it were deleted
+        condition = f'id = COALESCE((SELECT MIN(id) FROM "order" WHERE id >= {order_id}), (SELECT MAX(id) FROM "order"))'
+        return model.get_data('"order"', ["id", "company_id", "pay_system_id", "sum", "date"], condition) is not None
+    if operation == "update_data":
+        return model.update_data('"order"', {"sum": rng.randint(1, 10000)}, f"id = {order_id}")
+    if operation == "delete_data":
+        return model.delete_data('"order"', f"id = {order_id}")
+    if operation == "pay_systems_total_income":
+        left = rng.randint(1, 5000)
+        return model.pay_systems_total_income(left, left + rng.randint(100, 5000)) is not None
+    if operation == "company_orders_thru_period":
+        return model.company_orders_thru_period(str(day), str(day + datetime.timedelta(days=rng.randint(1, 365)))) is not None
+    if operation == "top_5_orders_total_price":
+        return model.top_5_orders_total_price(rng.choice(pools["company_names"])) is not None
+    raise ValueError(f"Unsupported operation '{operation}'")
+
+def run_worker(mix: dict, pools: dict, start: float, duration: Optional[float], operations: Optional[int], seed: int, db_name: Optional[str] = None) -> List[Tuple[str, float, float, bool]]:
+    """
+    This function is used to run operations in one worker until the duration or operation count is reached.
+
+    Parameters:
+    mix (dict): The weight of each operation.
+    pools (dict): The keys and names returned by load_pools.
+    start (float): The time.time() at which the test started.
+    duration (float, optional): The length of the test in seconds.
+    operations (int, optional): The number of operations run by this worker.
+    seed (int): The seed of the worker's random generator.
+    db_name (str, optional): The database to run against instead of main.DB_NAME.
+
+    Returns:
+    list: One tuple (operation, start offset in seconds, latency in seconds, success) per operation.
+    """
+    model = create_model(db_name)
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    records = []
+    while True:
+        now = time.time()
+        if duration is not None and now - start >= duration:
+            break
+        if operations is not None and len(records) >= operations:
+            break
+
+        operation = rng.choices(names, weights)[0]
+        try:
+            ok = run_operation(model, operation, pools, rng)
+        except Exception as e:
+            print(f"Error: {operation} failed\n", e)
+            ok = False
+        records.append((operation, now - start, time.time() - now, bool(ok)))
+    return records
+
+def monitor_connections(model: Model, start: float, interval: float, stop: threading.Event, samples: list):
+    # Sample the number of connections to the database on the primary until stopped, over one connection
+    conn, cur = model.connect(operation="monitor_connections")
+    if conn is None or cur is None:
+        return
+    while not stop.wait(interval):
+        try:
+            cur.execute("SELECT COUNT(*) FROM pg_stat_activity WHERE datname = current_database()")
+            samples.append((time.time() - start, cur.fetchone()[0]))
+            conn.commit()
+        except Exception as e:
+            print("Error: Invalid connections sample\n", e)
+            break
+    cur.close()
+    conn.close()
+
+def report(view: View, records: list, samples: list, elapsed: float, interval: float):
+    """
+    This function is used to display the results of a load test.
+
+    Parameters:
+    view (View): The view used to display the tables.
+    records (list): The records returned by the workers.
+    samples (list): The (offset, connections) samples taken during the test.
+    elapsed (float): The length of the test in seconds.
+    interval (float): The length of the reporting intervals in seconds.
+    """
+    if not records:
+        view.show_message("No operations were run.")
+        return
+
+    operations = np.array([record[0] for record in records])
+    offsets = np.array([record[1] for record in records])
+    latencies = np.array([record[2] for record in records]) * 1000
+    ok = np.array([record[3] for record in records])
+
+    # Totals per operation
+    rows = []
+    for name in list(dict.fromkeys(operations.tolist())) + ["total"]:
+        mask = operations == name if name != "total" else np.ones(len(records), dtype=bool)
+        p50, p95, p99 = np.percentile(latencies[mask], [50, 95, 99])
+        errors = int((~ok[mask]).sum())
+        rows.append((name, int(mask.sum()), f"{mask.sum() / elapsed:.1f}", f"{p50:.1f}", f"{p95:.1f}", f"{p99:.1f}", f"{latencies[mask].max():.1f}", errors, f"{errors / mask.sum():.2%}"))
+    view.show_message(f"\nLoad test: {len(records)} operations in {elapsed:.1f}s")
+    view.show_data(rows, ["operation", "count", "ops/sec", "p50 ms", "p95 ms", "p99 ms", "max ms", "errors", "error rate"])
+
+    # Throughput, latency and connections over time
+    rows = []
+    for bucket in range(int(np.ceil(elapsed / interval))):
+        mask = (offsets >= bucket * interval) & (offsets < (bucket + 1) * interval)
+        connections = [count for offset, count in samples if bucket * interval <= offset < (bucket + 1) * interval and count is not None]
+        if mask.any():
+            p50, p95 = np.percentile(latencies[mask], [50, 95])
+        else:
+            p50 = p95 = 0.0
+        rows.append((f"{bucket * interval:.0f}s", f"{mask.sum() / interval:.1f}", f"{p50:.1f}", f"{p95:.1f}", int((~ok[mask]).sum()), max(connections) if connections else "-"))
+    view.show_data(rows, ["time", "ops/sec", "p50 ms", "p95 ms", "errors", "connections"])
+
+def parse_mix(text: str) -> dict:
+    # Parse "operation=weight,operation=weight" into a dictionary
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unsupported operation '{name}'")
+        mix[name] = float(weight or 1)
+    return mix
+
+def main_load_test():
+    parser = argparse.ArgumentParser(description="Drive Model with a concurrent mixed workload and report throughput, latency, errors and connections.")
+    parser.add_argument("--workers", type=int, default=50, help="number of concurrent workers")
+    parser.add_argument("--processes", action="store_true", help="run workers in processes instead of threads")
+    parser.add_argument("--duration", type=float, default=None, help="length of the test in seconds")
+    parser.add_argument("--operations", type=int, default=None, help="total number of operations (instead of a duration)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="weights, e.g. get_data=10,insert_data=2")
+    parser.add_argument("--interval", type=float, default=5.0, help="length of the reporting intervals in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random arguments")
+    parser.add_argument("--db", default=None, help="database to run against instead of the application's DB_NAME (same user, host and replicas)")
+    parser.add_argument("--allow-writes", action="store_true", help=f"run the write operations of the mix ({', '.join(WRITE_OPERATIONS)}), which change or delete orders")
+    args = parser.parse_args()
+    if args.duration is None and args.operations is None:
+        args.duration = 60.0
+
+    view = View()
+    if not args.allow_writes:
+        writes = [name for name in args.mix if name in WRITE_OPERATIONS]
+        if writes:
+            view.show_message(f"Skipping {', '.join(writes)}, pass --allow-writes to run them.")
+        args.mix = {name: weight for name, weight in args.mix.items() if name not in WRITE_OPERATIONS}
+    if not args.mix:
+        view.show_message("The mix has no operations to run.")
+        return
+
+    model = create_model(args.db)
+    pools = load_pools(model)
+    if not pools["company_ids"] or not pools["pay_system_ids"]:
+        view.show_message("The company and pay_system tables must not be empty.")
+        return
+
+    # Split the operation count over the workers
+    per_worker = [None] * args.workers
+    if args.operations is not None:
+        per_worker = [args.operations // args.workers + (1 if i < args.operations % args.workers else 0) for i in range(args.workers)]
+
+    executor_class = concurrent.futures.ProcessPoolExecutor if args.processes else concurrent.futures.ThreadPoolExecutor
+    samples = []
+    stop = threading.Event()
+    start = time.time()
+    monitor = threading.Thread(target=monitor_connections, args=(model, start, min(args.interval, 1.0), stop, samples), daemon=True)
+    monitor.start()
+
+    records = []
+    with executor_class(max_workers=args.workers) as executor:
+        futures = [executor.submit(run_worker, args.mix, pools, start, args.duration, per_worker[i], args.seed + i, args.db) for i in range(args.workers)]
+        for future in concurrent.futures.as_completed(futures):
+            records.extend(future.result())
+    elapsed = time.time() - start
+
+    stop.set()
+    monitor.join()
+    report(view, records, samples, elapsed, args.interval)
+
+if __name__ == "__main__":
+    main_load_test()
@@ -5,8 +5,49 @@ USER = "postgres"
 HOST = "localhost"
 PASSWORD = "1111"
 
+# DSNs of read replicas, e.g. "dbname='...' user='postgres' host='localhost' port='5433' password='1111'"
+REPLICAS = []
+# How a replica is chosen for reads: "round_robin" or "least_loaded"
+REPLICA_STRATEGY = "round_robin"
+# Replicas lagging behind the primary by more than this many seconds are skipped
+MAX_REPLICA_LAG = 5.0
+
+# statement_timeout in milliseconds per Model method, "default" applies to the others (0 = no timeout)
+STATEMENT_TIMEOUTS = {
+    "default": 30000,
+    "get_data": 60000,
+    "generate_random_data": 600000,
+    "copy_random_data": 600000,
+    "pay_systems_total_income": 120000,
+    "company_orders_thru_period": 120000,
+    "top_5_orders_total_price": 120000,
+}
+
+# Directory of the local snapshot of orders used by the analytics queries, None to query the database
+SNAPSHOT_DIR = None
+
+# View Data, Find Data and analytics queries whose estimated plan exceeds these thresholds ask for confirmation (None to disable)
+PLAN_COST_THRESHOLD = 1000000
+PLAN_ROWS_THRESHOLD = 1000000
+
+# View Data and Find Data results estimated above this many rows are fetched column by column into NumPy arrays,
+# which needs less memory than row tuples (None to always fetch rows)
+COLUMNAR_ROWS_THRESHOLD = 100000
+
+# Cache schema metadata and query results, kept fresh by change notifications (install them from the menu, tables without them are not cached)
+CACHE_RESULTS = False
+
+# Directory of the persistent cache of analytics results kept across runs (None to disable) and its maximum size in bytes.
+# Results are invalidated by the table statistics counters, which lag writes: on PostgreSQL 15 and later a cached
+# result can be returned for about 10 seconds after a write, and for up to 60 seconds on a busy server
+RESULT_CACHE_DIR = "cache"
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Number of id ranges of "order" aggregated in parallel by the pay systems and company orders queries (1 = single query)
+AGGREGATION_SHARDS = 1
+
 def main():
-    controller = Controller(DB_NAME, USER, PASSWORD, HOST)
+    controller = Controller(DB_NAME, USER, PASSWORD, HOST, REPLICAS, REPLICA_STRATEGY, MAX_REPLICA_LAG, STATEMENT_TIMEOUTS, SNAPSHOT_DIR, PLAN_COST_THRESHOLD, PLAN_ROWS_THRESHOLD, CACHE_RESULTS, RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES, AGGREGATION_SHARDS, COLUMNAR_ROWS_THRESHOLD)
     controller.run()
 
 if __name__ == "__main__":
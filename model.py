@@ -1,8 +1,140 @@
+import collections
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import select
+import sqlite3
+import threading
+import time
 import psycopg2
-from typing import Optional, Tuple, Union, List
+import psycopg2.extensions
+import psycopg2.extras
+from typing import Callable, Iterable, Optional, Tuple, Union, List
+
+import numpy as np
+
+import generator
+from result_cache import ResultCache
+
+# NumPy dtypes of the columnar get_data format keyed by PostgreSQL type OID, other types are kept in lists
+COLUMNAR_DTYPES = {
+    16: "bool",            # boolean
+    20: "int64",           # bigint
+    21: "int16",           # smallint
+    23: "int32",           # integer
+    700: "float32",        # real
+    701: "float64",        # double precision
+    1700: "float64",       # numeric
+    1082: "datetime64[D]", # date
+    1114: "datetime64[us]", # timestamp
+}
+
+# Channel of the notifications sent by the change triggers, the payload is a table name or SCHEMA_CHANGE
+CHANGES_CHANNEL = "table_changes"
+SCHEMA_CHANGE = "ddl"
+
+CHANGE_TRIGGERS_QUERY = f"""
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGES_CHANNEL}', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Tables with a change trigger, and whether the DDL event trigger exists. Only results of these are cached.
+CHANGE_COVERAGE_QUERY = """
+SELECT
+    ARRAY(
+        SELECT c.relname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid
+        WHERE c.relnamespace = 'public'::regnamespace AND t.tgname = c.relname || '_notify_change' AND t.tgenabled <> 'D'
+    ),
+    EXISTS (SELECT 1 FROM pg_event_trigger WHERE evtname = 'notify_schema_change' AND evtenabled <> 'D')
+"""
+
+SCHEMA_TRIGGER_QUERY = f"""
+CREATE OR REPLACE FUNCTION notify_schema_change() RETURNS event_trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGES_CHANNEL}', '{SCHEMA_CHANGE}');
+END;
+$$ LANGUAGE plpgsql;
+DROP EVENT TRIGGER IF EXISTS notify_schema_change;
+CREATE EVENT TRIGGER notify_schema_change ON ddl_command_end EXECUTE FUNCTION notify_schema_change();
+"""
+
+# Text search configuration of full-text indexes and queries
+SEARCH_CONFIG = "simple"
+
+# Whether a column has a valid full-text index and a valid trigram index, found from the catalog:
+# the full-text index is a single-expression index on to_tsvector of the column (PostgreSQL prints
+# the column with a cast for varchar, so only the start of the expression is matched), the trigram
+# index has the column as its key with the gin_trgm_ops operator class.
+SEARCH_INDEX_QUERY = """
+SELECT
+    EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_depend d ON d.classid = 'pg_class'::regclass AND d.objid = i.indexrelid
+            AND d.refclassid = 'pg_class'::regclass AND d.refobjid = i.indrelid AND d.refobjsubid = a.attnum
+        WHERE i.indrelid = a.attrelid AND i.indisvalid AND i.indnatts = 1 AND i.indkey[0] = 0
+            AND pg_get_indexdef(i.indexrelid, 1, false) LIKE %(fulltext)s
+    ),
+    EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_opclass o ON o.oid = i.indclass[0]
+        WHERE i.indrelid = a.attrelid AND i.indisvalid AND i.indkey[0] = a.attnum AND o.opcname = 'gin_trgm_ops'
+    )
+FROM pg_attribute a
+WHERE a.attrelid = %(table)s::regclass AND a.attname = %(column)s AND NOT a.attisdropped
+"""
+
+# Whether a replica has replayed the primary's WAL up to a position, its replication lag (seconds)
+# and the number of active client backends on it. The lag is NULL (unknown) unless the WAL receiver
+# is streaming: a replica that lost its connection to the primary can be arbitrarily far behind.
+REPLICA_STATUS_QUERY = """
+SELECT
+    NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= %s::pg_lsn,
+    CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END,
+    (SELECT COUNT(*) FROM pg_stat_activity WHERE state = 'active' AND backend_type = 'client backend')
+"""
+
+def normalize_table(table: str) -> str:
+    """
+    This function is used to convert a table name as written in queries into the name sent by the triggers.
+    """
+    if table.startswith('"') and table.endswith('"'):
+        return table[1:-1]
+    return table.lower()
+
+def later_lsn(*lsns: Optional[str]) -> Optional[str]:
+    """
+    This function is used to pick the latest of WAL positions such as "16/B374D848", ignoring None.
+    """
+    def value(lsn: str) -> int:
+        high, low = lsn.split("/")
+        return (int(high, 16) << 32) | int(low, 16)
+
+    known = [lsn for lsn in lsns if lsn is not None]
+    return max(known, key=value) if known else None
+
+@contextlib.contextmanager
+def blocking_wait():
+    """
+    This context manager is used to run code that cannot use a wait callback (COPY) in blocking mode.
+    """
+    wait_callback = psycopg2.extensions.get_wait_callback()
+    psycopg2.extensions.set_wait_callback(None)
+    try:
+        yield
+    finally:
+        psycopg2.extensions.set_wait_callback(wait_callback)
 
 class Model:
-    def __init__(self, db_name: str, user: str, password: str, host: str):
+    def __init__(self, db_name: str, user: str, password: str, host: str, replicas: Optional[List[str]] = None, replica_strategy: str = "round_robin", max_replica_lag: float = 5.0, statement_timeouts: Optional[dict] = None, result_cache_dir: Optional[str] = None, result_cache_max_bytes: int = 64 * 1024 * 1024, shards: int = 1, cache_max_entries: int = 256, cache_max_rows: int = 10000):
         """
         This is the constructor method for the class. It initializes the instance variables with the provided values.
 
@@ -11,25 +143,109 @@ class Model:
         user (str): The username used to authenticate with the PostgreSQL server.
         host (str): The host of the PostgreSQL server.
         password (str): The password used to authenticate with the PostgreSQL server.
+        replicas (list, optional): A list of DSNs of read replicas. Read-only methods are sent to them, everything else to the primary.
+        replica_strategy (str, optional): How a replica is chosen: "round_robin" or "least_loaded" (fewest active backends).
+        max_replica_lag (float, optional): The replication lag in seconds above which a replica that has not
+        replayed the primary's current WAL position is skipped.
+        statement_timeouts (dict, optional): statement_timeout in milliseconds per method name (e.g. "get_data"),
+        with "default" used for methods not listed. 0 or missing means no timeout.
+        result_cache_dir (str, optional): The directory of the persistent cache of analytics results. Disabled if None.
+        result_cache_max_bytes (int, optional): The maximum size of the persistent cache in bytes.
+        shards (int, optional): The number of id ranges pay_systems_total_income and company_orders_thru_period
+        are split into and aggregated in parallel (see aggregate_sharded). 1 runs a single query.
+        cache_max_entries (int, optional): The number of results kept in the in-process cache, the least recently used are evicted.
+        cache_max_rows (int, optional): Results with more rows than this are not kept in the in-process cache.
         """
         self.db_name = db_name
         self.user = user
         self.password = password
         self.host = host
+        self.replicas = list(replicas or [])
+        self.replica_strategy = replica_strategy
+        self.max_replica_lag = max_replica_lag
+        self._replica_counter = itertools.count()
+        # The primary's WAL position and the loads of the replicas are measured again only after this
+        # many seconds, so that reads do not connect to the primary or to every replica each time
+        self.status_interval = max_replica_lag / 2
+        self._primary_lsn = (float("-inf"), None)
+        self._replica_loads = (float("-inf"), {})
+        self.statement_timeouts = dict(statement_timeouts or {})
+
+        # Results of read methods keyed by method and arguments, each with the tables it depends on.
+        # The cache is only used while the change listener is connected (see start_listener), and only
+        # for tables that have a change trigger (cache_tables) and for schema metadata if the DDL
+        # event trigger exists (cache_schema). cache_lsn is the WAL position of the primary when the
+        # last invalidation was received, reads that are cached must see it.
+        self.cache = collections.OrderedDict()
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_rows = cache_max_rows
+        self.cache_lock = threading.Lock()
+        self.cache_enabled = False
+        self.cache_generation = 0
+        self.cache_tables = set()
+        self.cache_schema = False
+        self.cache_lsn = None
+        self._listener = None
+        self._listener_stop = threading.Event()
+        self._coverage_stale = threading.Event()
+
+        # Analytics results kept across runs, valid while the tables they read are unchanged
+        self.result_cache = None
+        if result_cache_dir is not None:
+            try:
+                self.result_cache = ResultCache(result_cache_dir, result_cache_max_bytes)
+            except (OSError, sqlite3.Error) as e:
+                print("Warning: Result cache disabled\n", e)
+        self.shards = shards
+
+        # Wait for query results with select() so that Ctrl-C sends a cancel request to the backend
+        # and surfaces as QueryCanceledError instead of leaving the query running on the server
+        psycopg2.extensions.set_wait_callback(psycopg2.extras.wait_select)
+
+    @property
+    def dsn(self) -> str:
+        """
+        The DSN of the primary server.
+        """
+        return f"dbname='{self.db_name}' user='{self.user}' host='{self.host}' password='{self.password}'"
+
+    def connection_options(self, operation: Optional[str] = None) -> str:
+        """
+        This method is used to build the server options for a connection used by a specific operation.
+
+        Parameters:
+        operation (str, optional): The name of the Model method the connection is used by.
+
+        Returns:
+        str: The value of the libpq "options" parameter.
+        """
+        timeout = self.statement_timeouts.get(operation, self.statement_timeouts.get("default", 0))
+        return f"-c statement_timeout={int(timeout or 0)}"
 
-    def connect(self) -> Tuple[Optional[psycopg2.extensions.connection], Optional[psycopg2.extensions.cursor]]:
+    def connect(self, read_only: bool = False, operation: Optional[str] = None, min_lsn: Optional[str] = None) -> Tuple[Optional[psycopg2.extensions.connection], Optional[psycopg2.extensions.cursor]]:
         """
         This method is used to establish a connection to the PostgreSQL database.
 
         It uses the psycopg2 library to create a connection and a cursor object.
         The connection details are taken from the instance variables of the class.
 
+        Parameters:
+        read_only (bool, optional): If True and replicas are configured, connect to a healthy replica,
+        falling back to the primary if none is available. Defaults to False.
+        operation (str, optional): The name of the calling method, used to pick its statement timeout.
+        min_lsn (str, optional): A WAL position of the primary the read must see (see connect_replica).
+
         Returns:
         conn (psycopg2.extensions.connection, optional): The connection object to the database, or None if the connection was not successful.
         cur (psycopg2.extensions.cursor, optional): The cursor object to execute PostgreSQL commands through Python, or None if the connection was not successful.
         """
+        if read_only and self.replicas:
+            conn, _ = self.connect_replica(operation, min_lsn)
+            if conn is not None:
+                return conn, conn.cursor()
+
         try:
-            conn = psycopg2.connect(f"dbname='{self.db_name}' user='{self.user}' host='{self.host}' password='{self.password}'")
+            conn = psycopg2.connect(self.dsn, options=self.connection_options(operation))
             cur = conn.cursor()
         except psycopg2.OperationalError as e:
             print("Unable to connect to the database\n", e)
@@ -37,6 +253,462 @@ class Model:
 
         return conn, cur
 
+    def primary_lsn(self) -> Optional[str]:
+        """
+        This method is used to read the current WAL position of the primary.
+
+        Returns:
+        str or None: The position (e.g. "0/3000148"), or None if the primary is unreachable.
+        """
+        try:
+            conn = psycopg2.connect(self.dsn, options=self.connection_options("primary_lsn"))
+        except psycopg2.OperationalError:
+            return None
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_current_wal_lsn()")
+                lsn = cur.fetchone()[0]
+            conn.commit()
+        except psycopg2.Error:
+            return None
+        finally:
+            conn.close()
+
+        return lsn
+
+    def recent_primary_lsn(self) -> Optional[str]:
+        """
+        This method is used to get a WAL position of the primary read at most status_interval seconds ago.
+
+        A replica that has replayed it misses at most the changes of the last status_interval seconds.
+
+        Returns:
+        str or None: The position, or None if the primary was unreachable at the last attempt.
+        """
+        read_at, lsn = self._primary_lsn
+        if time.monotonic() - read_at > self.status_interval:
+            read_at = time.monotonic()
+            lsn = self.primary_lsn()
+            self._primary_lsn = (read_at, lsn)
+        return lsn
+
+    def replica_status(self, conn: psycopg2.extensions.connection, lsn: Optional[str]) -> Tuple[bool, Optional[float], int]:
+        """
+        This method is used to check the replication state and load of a replica.
+
+        Parameters:
+        conn (psycopg2.extensions.connection): The connection to the replica.
+        lsn (str, optional): A WAL position of the primary.
+
+        Returns:
+        (bool, float or None, int): Whether the replica has replayed the primary's WAL up to lsn (False if lsn is None),
+        the replication lag in seconds (None if the replica is not streaming from the primary)
+        and the number of active client backends.
+        """
+        with conn.cursor() as cur:
+            cur.execute(REPLICA_STATUS_QUERY, (lsn,))
+            replayed, lag, active = cur.fetchone()
+        conn.commit()
+        return bool(replayed), None if lag is None else float(lag), int(active)
+
+    def connect_replica(self, operation: Optional[str] = None, min_lsn: Optional[str] = None) -> Tuple[Optional[psycopg2.extensions.connection], Optional[str]]:
+        """
+        This method is used to establish a read-only connection to one of the replicas.
+
+        Replicas that have replayed a recent WAL position of the primary (see recent_primary_lsn) are up to date;
+        the others are used only while they are streaming from the primary and lag at most max_replica_lag
+        seconds behind it. If min_lsn is given, only replicas that have replayed that position are used.
+        Unreachable replicas are skipped. With the "least_loaded" strategy the load of every replica is
+        measured at most every status_interval seconds, in between the replicas are tried from the least
+        loaded one and only one connection is opened.
+
+        Parameters:
+        operation (str, optional): The name of the calling method, used to pick its statement timeout.
+        min_lsn (str, optional): A WAL position of the primary the read must see, e.g. the position at which a
+        cached result was invalidated. max_replica_lag does not apply.
+
+        Returns:
+        conn (psycopg2.extensions.connection, optional): The connection to the chosen replica, or None if no replica is available.
+        dsn (str, optional): The DSN of the chosen replica, or None if no replica is available.
+        """
+        lsn = min_lsn if min_lsn is not None else self.recent_primary_lsn()
+
+        # Start with the next replica in turn so that ties and failures rotate over all of them
+        start = next(self._replica_counter) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+
+        measure_all = False
+        if self.replica_strategy == "least_loaded":
+            measured_at, loads = self._replica_loads
+            if time.monotonic() - measured_at > self.status_interval:
+                measure_all = True
+                measured_at, loads = time.monotonic(), {}
+            else:
+                # The sort is stable, replicas with the same load keep their turn. Replicas that were
+                # unreachable or behind are tried last.
+                ordered.sort(key=lambda dsn: loads.get(dsn, float("inf")))
+
+        candidates = []
+        for dsn in ordered:
+            try:
+                conn = psycopg2.connect(dsn, options=self.connection_options(operation))
+            except psycopg2.OperationalError:
+                continue
+
+            try:
+                conn.set_session(readonly=True)
+                replayed, lag, active = self.replica_status(conn, lsn)
+            except psycopg2.Error:
+                conn.close()
+                continue
+
+            fresh = replayed or (min_lsn is None and lag is not None and lag <= self.max_replica_lag)
+            if not fresh:
+                conn.close()
+                continue
+
+            if not measure_all:
+                return conn, dsn
+            loads[dsn] = active
+            candidates.append((active, conn, dsn))
+
+        if measure_all:
+            self._replica_loads = (measured_at, loads)
+        if not candidates:
+            return None, None
+
+        # Keep the least loaded replica and close the others
+        chosen = min(candidates, key=lambda candidate: candidate[0])
+        for _, conn, _ in candidates:
+            if conn is not chosen[1]:
+                conn.close()
+        return chosen[1], chosen[2]
+
+    def cache_get(self, key: tuple):
+        """
+        This method is used to look up the cached result of a read method.
+
+        Parameters:
+        key (tuple): The method name and its arguments.
+
+        Returns:
+        The cached result, or None if there is none or caching is disabled.
+        """
+        if not self.cache_enabled:
+            return None
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            self.cache.move_to_end(key)
+        return entry[1]
+
+    def cache_covers(self, tables: list) -> bool:
+        """
+        This method is used to check whether changes of all the tables are notified, so results depending on them can be cached.
+
+        Parameters:
+        tables (list): The tables a result depends on, SCHEMA_CHANGE for schema metadata.
+
+        Returns:
+        bool: True if the result can be cached, False otherwise.
+        """
+        for table in tables:
+            if table == SCHEMA_CHANGE:
+                if not self.cache_schema:
+                    return False
+            elif normalize_table(table) not in self.cache_tables:
+                return False
+        return True
+
+    def cache_min_lsn(self, tables: list) -> Optional[str]:
+        """
+        This method is used to get the WAL position a read must see for its result to be cached.
+
+        A replica that has not replayed the change behind the last invalidation would return a result
+        older than the cache believes, which would then be served until the next change.
+
+        Parameters:
+        tables (list): The tables the result depends on, SCHEMA_CHANGE for schema metadata.
+
+        Returns:
+        str or None: The position (see connect), or None if the result is not going to be cached.
+        """
+        if not self.cache_enabled or not self.cache_covers(tables):
+            return None
+        return self.cache_lsn
+
+    def cache_put(self, key: tuple, tables: list, value, generation: int):
+        """
+        This method is used to cache the result of a read method.
+
+        Parameters:
+        key (tuple): The method name and its arguments.
+        tables (list): The tables the result depends on, SCHEMA_CHANGE for schema metadata.
+        value: The result. None (errors and empty results) and results with more than cache_max_rows rows are not cached.
+        generation (int): The cache_generation read before the query. If anything was invalidated
+        since then, the result may predate the change and is not cached.
+        """
+        if not self.cache_enabled or value is None:
+            return
+        # Columnar results are keyed by column, their rows are the length of a column
+        rows = len(next(iter(value.values()))) if isinstance(value, dict) else len(value)
+        if rows > self.cache_max_rows:
+            return
+        with self.cache_lock:
+            if generation == self.cache_generation and self.cache_covers(tables):
+                self.cache[key] = ({normalize_table(table) for table in tables}, value)
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.cache_max_entries:
+                    self.cache.popitem(last=False)
+
+    def invalidate(self, table: Optional[str] = None):
+        """
+        This method is used to drop cached results that depend on a table.
+
+        Parameters:
+        table (str, optional): The changed table, or SCHEMA_CHANGE after DDL. If None, the whole cache is dropped.
+        """
+        with self.cache_lock:
+            self.cache_generation += 1
+            if table is None or table == SCHEMA_CHANGE:
+                # DDL can change any table (drops, renames, new columns) and the triggers themselves
+                self.cache.clear()
+                self._coverage_stale.set()
+                return
+            table = normalize_table(table)
+            for key in [key for key, (tables, _) in self.cache.items() if table in tables]:
+                del self.cache[key]
+
+    def set_cache_coverage(self, tables: list, schema: bool):
+        """
+        This method is used to set which results can be cached and drop the cached results that no longer can.
+
+        Parameters:
+        tables (list): The names of the tables that have a change trigger.
+        schema (bool): Whether the DDL event trigger exists.
+        """
+        with self.cache_lock:
+            self.cache_generation += 1
+            self.cache_tables = set(tables)
+            self.cache_schema = schema
+            for key in [key for key, (depends, _) in self.cache.items() if not self.cache_covers(depends)]:
+                del self.cache[key]
+
+    def change_marker(self, tables: list) -> Tuple[Optional[str], Optional[str]]:
+        """
+        This method is used to read a marker that changes whenever the data of the tables changes.
+
+        The marker combines the insert, update and delete counters of pg_stat_user_tables with the
+        relation file node, which changes on TRUNCATE. It is read from the primary, where the counters
+        are kept, together with the primary's WAL position: a result is only valid for the marker if
+        it was computed on a server that has replayed that position.
+
+        The counters only change when the writing session reports its statistics, not at commit. On
+        PostgreSQL 15 and later a session reports them at most once a second, an idle session within
+        about 10 seconds, and one whose reports wait on a lock only after up to 60 seconds. Until then
+        the marker is unchanged and a cached result older than the write is returned.
+
+        Parameters:
+        tables (list): The names of the tables (without quotes).
+
+        Returns:
+        (str or None, str or None): The marker and the WAL position, or None and None if there is an error in connection or execution.
+        """
+        conn, cur = self.connect(operation="change_marker")
+
+        if conn is None or cur is None:
+            return None, None
+
+        try:
+            query = (
+                "SELECT relname, pg_relation_filenode(relid), n_tup_ins, n_tup_upd, n_tup_del "
+                "FROM pg_stat_user_tables WHERE schemaname = 'public' AND relname = ANY(%s) ORDER BY relname"
+            )
+            cur.execute(query, (list(tables),))
+            marker = repr(cur.fetchall())
+            # Read after the counters, so every change they count is before this position
+            cur.execute("SELECT pg_current_wal_lsn()")
+            lsn = cur.fetchone()[0]
+        except Exception as e:
+            print("Error: Invalid change marker get\n", e)
+            return None, None
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        return marker, lsn
+
+    def result_cache_get(self, query: str, tables: list) -> Tuple[Optional[List[Tuple]], Optional[str], Optional[str]]:
+        """
+        This method is used to look up an analytics result in the persistent cache.
+
+        Parameters:
+        query (str): The query of the analytics method, with its parameters.
+        tables (list): The names of the tables the query reads.
+
+        Returns:
+        (list or None, str or None, str or None): The cached result (None on a miss), the current change marker
+        to be passed to result_cache_put, and the WAL position the query must then see (pass it to connect as min_lsn).
+        The marker and position are None if the cache is disabled or the marker is unavailable.
+        """
+        if self.result_cache is None:
+            return None, None, None
+        marker, lsn = self.change_marker(tables)
+        if marker is None:
+            return None, None, None
+        return self.result_cache.get(query, marker), marker, lsn
+
+    def result_cache_put(self, query: str, marker: Optional[str], data):
+        """
+        This method is used to store an analytics result in the persistent cache.
+
+        Parameters:
+        query (str): The query of the analytics method, with its parameters.
+        marker (str, optional): The change marker returned by result_cache_get before the query was executed
+        on a server that has replayed its WAL position.
+        data: The result.
+        """
+        if self.result_cache is not None and marker is not None and data is not None:
+            self.result_cache.put(query, marker, data)
+
+    def install_change_notifications(self, tables: list) -> bool:
+        """
+        This method is used to install the triggers that notify all instances about changes.
+
+        Each table gets a statement-level trigger that sends its name on CHANGES_CHANNEL after
+        INSERT, UPDATE, DELETE and TRUNCATE. An event trigger sends SCHEMA_CHANGE after DDL;
+        creating it requires superuser rights, without it schema metadata is invalidated only locally.
+
+        Parameters:
+        tables (list): The names of the tables to be tracked.
+
+        Returns:
+        bool: True if the table triggers were successfully installed, False otherwise.
+        """
+        conn, cur = self.connect(operation="install_change_notifications")
+
+        if conn is None or cur is None:
+            return False
+
+        try:
+            cur.execute(CHANGE_TRIGGERS_QUERY)
+            for table in tables:
+                trigger = f"{normalize_table(table)}_notify_change"
+                cur.execute(f'DROP TRIGGER IF EXISTS "{trigger}" ON {table}')
+                cur.execute(
+                    f'CREATE TRIGGER "{trigger}" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+                    f"FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()"
+                )
+            conn.commit()
+
+            try:
+                cur.execute(SCHEMA_TRIGGER_QUERY)
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                print("Warning: DDL notifications not installed, schema metadata will not be cached\n", e)
+        except Exception as e:
+            print("Error: Invalid change notifications install\n", e)
+            return False
+
+        cur.close()
+        conn.close()
+
+        # Let the listener pick up the new triggers
+        self.invalidate(SCHEMA_CHANGE)
+        return True
+
+    def start_listener(self, retry_delay: float = 5.0, coverage_interval: float = 30.0):
+        """
+        This method is used to start the background thread that listens for change notifications.
+
+        While the listener is connected, read results are cached and dropped when a notification for a
+        table they depend on arrives. If the connection is lost the cache is cleared and disabled until
+        the listener reconnects, so no result is served that could have missed a notification.
+        Only results of tables with a change trigger are cached, and schema metadata only if the DDL
+        event trigger exists (see install_change_notifications); the triggers are looked up again after
+        DDL and every coverage_interval seconds. Reads that are cached only use replicas that have
+        replayed the primary's WAL up to the last received notification (see cache_min_lsn), so a
+        cached result is never older than the last change that was notified.
+
+        Parameters:
+        retry_delay (float, optional): The number of seconds between reconnection attempts.
+        coverage_interval (float, optional): The number of seconds between lookups of the triggers.
+        """
+        if self._listener is not None:
+            return
+        self._listener_stop.clear()
+        self._listener = threading.Thread(target=self.listen_for_changes, args=(retry_delay, coverage_interval), daemon=True)
+        self._listener.start()
+
+    def stop_listener(self):
+        """
+        This method is used to stop the change listener and disable the cache.
+        """
+        if self._listener is None:
+            return
+        self._listener_stop.set()
+        self._listener.join()
+        self._listener = None
+
+    def listen_for_changes(self, retry_delay: float = 5.0, coverage_interval: float = 30.0):
+        """
+        This method is the body of the listener thread started by start_listener.
+
+        Parameters:
+        retry_delay (float, optional): The number of seconds between reconnection attempts.
+        coverage_interval (float, optional): The number of seconds between lookups of the triggers.
+        """
+        while not self._listener_stop.is_set():
+            conn = None
+            try:
+                # Notifications come from the primary, where the triggers run
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANGES_CHANNEL}")
+                # Changes made before now were not notified, cached reads must see them
+                cur.execute("SELECT pg_current_wal_lsn()")
+                self.cache_lsn = cur.fetchone()[0]
+                cur.execute(CHANGE_COVERAGE_QUERY)
+                self.set_cache_coverage(*cur.fetchone())
+                self.cache_enabled = True
+
+                checked = time.monotonic()
+                while not self._listener_stop.is_set():
+                    if self._coverage_stale.is_set() or time.monotonic() - checked >= coverage_interval:
+                        self._coverage_stale.clear()
+                        cur.execute(CHANGE_COVERAGE_QUERY)
+                        self.set_cache_coverage(*cur.fetchone())
+                        checked = time.monotonic()
+
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        payloads = [notify.payload for notify in conn.notifies]
+                        del conn.notifies[:]
+                        # The notified transactions committed before this position. It is set before the
+                        # invalidation, so reads after it cannot be cached from a replica that missed them.
+                        # Notifications received during this query are handled in the next round.
+                        cur.execute("SELECT pg_current_wal_lsn()")
+                        self.cache_lsn = cur.fetchone()[0]
+                        for payload in payloads:
+                            self.invalidate(payload)
+            except psycopg2.Error as e:
+                print("Warning: change listener disconnected\n", e)
+            finally:
+                # Anything cached from now on could miss a notification
+                self.cache_enabled = False
+                self.invalidate()
+                if conn is not None:
+                    conn.close()
+
+            self._listener_stop.wait(retry_delay)
+
     def insert_data(self, table: str, columns: list, data: list) -> bool:
         """
         This method is used to insert data into a specific table in the database.
@@ -49,7 +721,7 @@ class Model:
         Returns:
         bool: True if the data was successfully inserted, False otherwise.
         """
-        conn, cur = self.connect()
+        conn, cur = self.connect(operation="insert_data")
         
         if conn is None or cur is None:
             return False
@@ -69,7 +741,9 @@ class Model:
         cur.close()
         conn.close()
 
+        self.invalidate(table)
         return True
+
     
     def get_tables(self) -> Union[list, None]:
         """
@@ -79,7 +753,13 @@ class Model:
         tables (list or None): A list of strings representing the names of the tables in the database.
         None: If there is an error in connection or execution, or if there are no tables in the database.
         """
-        conn, cur = self.connect()
+        key = ("get_tables",)
+        cached = self.cache_get(key)
+        if cached is not None:
+            return cached
+        generation = self.cache_generation
+
+        conn, cur = self.connect(read_only=True, operation="get_tables", min_lsn=self.cache_min_lsn([SCHEMA_CHANGE]))
 
         if conn is None or cur is None:
             return None
@@ -100,9 +780,29 @@ class Model:
         if len(tables) == 0:
             return None
 
+        self.cache_put(key, [SCHEMA_CHANGE], tables, generation)
         return tables
 
-    def get_data(self, table: str, columns: list, condition=None) -> Union[list, None]:
+    def get_data_query(self, table: str, columns: list, condition=None) -> str:
+        """
+        This method is used to build the query executed by get_data.
+
+        Parameters:
+        table (str): The name of the table from which the data will be retrieved.
+        columns (list): The names of the columns to be retrieved.
+        condition (str, optional): The condition for the data retrieval. Defaults to None.
+
+        Returns:
+        str: The SQL query.
+        """
+        # Convert the list of columns into a comma-separated string
+        columns_str = ', '.join(columns)
+
+        if condition is None:
+            return f"SELECT {columns_str} FROM {table}"
+        return f"SELECT {columns_str} FROM {table} WHERE {condition}"
+
+    def get_data(self, table: str, columns: list, condition=None, columnar: bool = False, batch_size: int = 10000) -> Union[list, dict, None]:
         """
         This method is used to retrieve data from a specific table in the database.
 
@@ -110,27 +810,36 @@ class Model:
         table (str): The name of the table from which the data will be retrieved.
         columns (list): The names of the columns to be retrieved.
         condition (str, optional): The condition for the data retrieval. Defaults to None.
+        columnar (bool, optional): If True, return the data column by column (see get_data_columnar). Defaults to False.
+        batch_size (int, optional): The number of rows fetched per round trip in the columnar format.
 
         Returns:
-        data (list or None): A list of tuples representing the rows of data retrieved from the database.
+        data (list, dict or None): A list of tuples representing the rows of data retrieved from the database,
+        or a dictionary of columns if columnar is True.
         None: If there is an error in connection or execution, or if the table is empty
         """
-        conn, cur = self.connect()
+        # Only reads without a condition are cached: a condition can read other tables (subqueries)
+        # or change its result without any write (now(), random()), neither of which invalidates it
+        cacheable = condition is None
+        key = ("get_data", table, tuple(columns), columnar)
+        if cacheable:
+            cached = self.cache_get(key)
+            if cached is not None:
+                return cached
+        generation = self.cache_generation
+
+        conn, cur = self.connect(read_only=True, operation="get_data", min_lsn=self.cache_min_lsn([table]) if cacheable else None)
 
         if conn is None or cur is None:
             return None
         
-        # Convert the list of columns into a comma-separated string
-        columns_str = ', '.join(columns)
-        
         try:
-            if condition is None:
-                query = f"SELECT {columns_str} FROM {table}"
+            query = self.get_data_query(table, columns, condition)
+            if columnar:
+                data = self.get_data_columnar(conn, query, batch_size)
             else:
-                query = f"SELECT {columns_str} FROM {table} WHERE {condition}"
-
-            cur.execute(query)
-            data = cur.fetchall()
+                cur.execute(query)
+                data = cur.fetchall()
         except Exception as e:
             print("Error: Invalid data get\n", e)
             return None
@@ -140,9 +849,63 @@ class Model:
         conn.close()
 
         # If the table is empty, return "No data found"
-        if len(data) == 0:
+        if len(data) == 0 or (columnar and len(next(iter(data.values()))) == 0):
             return None
 
+        if cacheable:
+            self.cache_put(key, [table], data, generation)
+        return data
+
+    def get_data_columnar(self, conn: psycopg2.extensions.connection, query: str, batch_size: int = 10000) -> dict:
+        """
+        This method is used to fetch the result of a query column by column.
+
+        Rows are read batch by batch from a server-side cursor and each batch is converted right away,
+        so the full result never exists as row tuples. Numeric, boolean, date and timestamp columns become
+        NumPy arrays (numeric is converted to float64, NULL to NaN/NaT); integer and boolean columns
+        containing NULL, and all other types, are kept in lists.
+
+        Parameters:
+        conn (psycopg2.extensions.connection): The connection used to run the query.
+        query (str): The query to be executed.
+        batch_size (int, optional): The number of rows fetched per round trip.
+
+        Returns:
+        dict: The values of each column (NumPy array or list) keyed by column name, in query order.
+        """
+        cur = conn.cursor(name="get_data_columnar")
+        cur.itersize = batch_size
+        cur.execute(query)
+
+        chunks = None
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if chunks is None:
+                # The description of a server-side cursor is known after the first fetch
+                names = [column.name for column in cur.description]
+                dtypes = [COLUMNAR_DTYPES.get(column.type_code) for column in cur.description]
+                chunks = [[] for _ in names]
+            if not batch:
+                break
+
+            for i, values in enumerate(zip(*batch)):
+                dtype = dtypes[i]
+                if dtype is not None and dtype in ("bool", "int16", "int32", "int64") and None in values:
+                    # NULL has no integer representation, keep this column as a list from now on
+                    chunks[i] = [value for chunk in chunks[i] for value in chunk.tolist()]
+                    dtypes[i] = dtype = None
+                if dtype is None:
+                    chunks[i].extend(values)
+                else:
+                    chunks[i].append(np.array(values, dtype=dtype))
+        cur.close()
+
+        data = {}
+        for name, dtype, chunk in zip(names, dtypes, chunks):
+            if dtype is None:
+                data[name] = chunk
+            else:
+                data[name] = np.concatenate(chunk) if chunk else np.empty(0, dtype=dtype)
         return data
     
     def get_columns(self, table: str) -> Union[list, None]:
@@ -156,7 +919,13 @@ class Model:
         columns (list or None): A list of tuples representing the column names of the table.
         None: If there is an error in connection or execution, or if the table does not exist.
         """
-        conn, cur = self.connect()
+        key = ("get_columns", table)
+        cached = self.cache_get(key)
+        if cached is not None:
+            return cached
+        generation = self.cache_generation
+
+        conn, cur = self.connect(read_only=True, operation="get_columns", min_lsn=self.cache_min_lsn([SCHEMA_CHANGE]))
 
         if conn is None or cur is None:
             return None
@@ -177,6 +946,7 @@ class Model:
         if len(columns) == 0:
             return None
 
+        self.cache_put(key, [SCHEMA_CHANGE], columns, generation)
         return columns
 
     def update_data(self, table: str, data: dict, condition=None) -> bool:
@@ -191,7 +961,7 @@ class Model:
         Returns:
         bool: True if the data was successfully updated, False otherwise.
         """
-        conn, cur = self.connect()
+        conn, cur = self.connect(operation="update_data")
         
         if conn is None or cur is None:
             return False
@@ -218,8 +988,104 @@ class Model:
         cur.close()
         conn.close()
 
+        self.invalidate(table)
         return True
 
+    def column_types(self, cur: psycopg2.extensions.cursor, table: str) -> dict:
+        """
+        This method is used to retrieve the SQL types of the columns of a specific table.
+
+        Parameters:
+        cur (psycopg2.extensions.cursor): The cursor used to run the query.
+        table (str): The name of the table.
+
+        Returns:
+        dict: The base type of each column without its modifier (e.g. "integer", "character varying"), keyed by column name.
+        """
+        cur.execute(
+            "SELECT attname, format_type(atttypid, NULL) FROM pg_attribute "
+            "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped",
+            (table,),
+        )
+        return dict(cur.fetchall())
+
+    def bulk_update(self, table: str, key: str, rows: Iterable[dict], upsert: bool = False, batch_size: int = 1000) -> Union[int, None]:
+        """
+        This method is used to update many rows of a specific table, each with its own values.
+
+        Rows are applied in batches with one statement per batch: UPDATE ... FROM (VALUES ...) matching
+        on the key column, or INSERT ... ON CONFLICT (key) DO UPDATE if upsert is True (the key column
+        must have a unique constraint). All batches run in one transaction. If a key appears more than
+        once within a batch, its last row wins.
+
+        Parameters:
+        table (str): The name of the table where the data will be updated.
+        key (str): The name of the column identifying the rows.
+        rows (iterable): Dictionaries mapping column names to new values. All rows must have the same columns, including the key.
+        upsert (bool, optional): If True, rows whose key does not exist are inserted. Defaults to False.
+        batch_size (int, optional): The number of rows per statement.
+
+        Returns:
+        int or None: The number of rows affected, or None if there is an error in connection or execution.
+        """
+        conn, cur = self.connect(operation="bulk_update")
+
+        if conn is None or cur is None:
+            return None
+
+        affected = 0
+        try:
+            types = self.column_types(cur, table)
+            columns = None
+            batch = {}
+            rows = iter(rows)
+
+            while True:
+                row = next(rows, None)
+                if row is not None:
+                    if columns is None:
+                        columns = list(row)
+                        if key not in columns:
+                            raise ValueError(f"Key column '{key}' is missing in the rows")
+                        if len(columns) == 1 and not upsert:
+                            raise ValueError("Rows have no columns to update")
+                    batch[row[key]] = tuple(row[column] for column in columns)
+
+                if batch and (row is None or len(batch) >= batch_size):
+                    columns_str = ', '.join(columns)
+                    updated = [column for column in columns if column != key]
+
+                    if upsert:
+                        set_str = ', '.join(f"{column} = EXCLUDED.{column}" for column in updated)
+                        action = f"DO UPDATE SET {set_str}" if updated else "DO NOTHING"
+                        query = f"INSERT INTO {table} ({columns_str}) VALUES %s ON CONFLICT ({key}) {action}"
+                        psycopg2.extras.execute_values(cur, query, list(batch.values()), page_size=len(batch))
+                    else:
+                        # VALUES literals are untyped, cast them to the base types of the target columns.
+                        # The length limits are left to the assignment, an explicit cast would silently truncate.
+                        set_str = ', '.join(f"{column} = v.{column}::{types[column]}" for column in updated)
+                        query = (
+                            f"UPDATE {table} SET {set_str} FROM (VALUES %s) AS v ({columns_str}) "
+                            f"WHERE {table}.{key} = v.{key}::{types[key]}"
+                        )
+                        psycopg2.extras.execute_values(cur, query, list(batch.values()), page_size=len(batch))
+
+                    affected += cur.rowcount
+                    batch = {}
+
+                if row is None:
+                    break
+        except Exception as e:
+            print("Error: Invalid bulk update\n", e)
+            return None
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        self.invalidate(table)
+        return affected
+
     def delete_data(self, table: str, condition: str) -> bool:
         """
         This method is used to delete data from a specific table in the database.
@@ -231,7 +1097,7 @@ class Model:
         Returns:
         bool: True if the data was successfully deleted, False otherwise.
         """
-        conn, cur = self.connect()
+        conn, cur = self.connect(operation="delete_data")
         
         if conn is None or cur is None:
             return False
@@ -247,8 +1113,109 @@ class Model:
         cur.close()
         conn.close()
 
+        self.invalidate(table)
         return True
 
+    def primary_key(self, cur: psycopg2.extensions.cursor, table: str) -> Optional[str]:
+        """
+        This method is used to retrieve the primary key column of a specific table.
+
+        Parameters:
+        cur (psycopg2.extensions.cursor): The cursor used to run the query.
+        table (str): The name of the table.
+
+        Returns:
+        str or None: The name of the primary key column, or None if the table has no single-column primary key.
+        """
+        cur.execute(
+            "SELECT a.attname FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = %s::regclass AND i.indisprimary",
+            (table,),
+        )
+        columns = cur.fetchall()
+        return columns[0][0] if len(columns) == 1 else None
+
+    def delete_data_batched(self, table: str, condition: str, batch_size: int = 10000, max_rows_per_sec: Optional[float] = None, progress: Optional[Callable] = None, start_after=None) -> Union[int, None]:
+        """
+        This method is used to delete data matching a condition in bounded batches, committing after each batch.
+
+        Batches walk the table in primary key order, so each batch continues where the previous one
+        stopped instead of scanning the deleted rows again. Tables without a single-column primary key
+        are deleted by ctid. Because every batch is committed, an interrupted delete keeps its progress;
+        pass the last reported key as start_after (or just run it again) to resume.
+
+        Parameters:
+        table (str): The name of the table where the data will be deleted.
+        condition (str): The condition for the data deletion.
+        batch_size (int, optional): The maximum number of rows deleted per batch.
+        max_rows_per_sec (float, optional): Sleep between batches so that the delete rate stays below this value.
+        progress (callable, optional): Called after each committed batch with the total number of deleted rows
+        and the last deleted primary key (None when deleting by ctid).
+        start_after (optional): Only rows with a primary key greater than this value are deleted.
+
+        Returns:
+        int or None: The number of rows deleted, or None if there is an error in connection or execution.
+        """
+        if batch_size < 1:
+            print("Error: Batch size must be at least 1")
+            return None
+
+        conn, cur = self.connect(operation="delete_data_batched")
+
+        if conn is None or cur is None:
+            return None
+
+        deleted = 0
+        try:
+            key = self.primary_key(cur, table)
+            last_key = start_after
+            start = time.perf_counter()
+
+            while True:
+                if key is not None:
+                    # Inline the key value: the condition is raw SQL and may contain '%'
+                    after = f"{key} > {cur.mogrify('%s', (last_key,)).decode()} AND " if last_key is not None else ""
+                    query = f"""
+                    WITH batch AS (
+                        SELECT {key} FROM {table} WHERE {after}({condition}) ORDER BY {key} LIMIT {int(batch_size)}
+                    )
+                    DELETE FROM {table} USING batch WHERE {table}.{key} = batch.{key}
+                    RETURNING {table}.{key}
+                    """
+                    cur.execute(query)
+                    keys = [row[0] for row in cur.fetchall()]
+                    if keys:
+                        last_key = max(keys)
+                else:
+                    query = f"DELETE FROM {table} WHERE ctid = ANY(ARRAY(SELECT ctid FROM {table} WHERE ({condition}) LIMIT {int(batch_size)}))"
+                    cur.execute(query)
+
+                batch_deleted = cur.rowcount
+                conn.commit()
+                deleted += batch_deleted
+
+                if progress is not None:
+                    progress(deleted, last_key if key is not None else None)
+
+                if batch_deleted == 0 or batch_deleted < batch_size:
+                    break
+
+                # Throttle: wait until the overall rate drops to the limit
+                if max_rows_per_sec:
+                    delay = deleted / max_rows_per_sec - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+        except Exception as e:
+            print("Error: Invalid data delete\n", e)
+            return None
+
+        cur.close()
+        conn.close()
+
+        self.invalidate(table)
+        return deleted
+
     def create_table(self, table: str, columns: list, data_types: list) -> bool:
         """
         This method is used to create a table in the database.
@@ -261,7 +1228,7 @@ class Model:
         Returns:
         bool: True if the table was successfully created, False otherwise.
         """
-        conn, cur = self.connect()
+        conn, cur = self.connect(operation="create_table")
         
         if conn is None or cur is None:
             return False
@@ -280,6 +1247,7 @@ class Model:
         cur.close()
         conn.close()
 
+        self.invalidate(SCHEMA_CHANGE)
         return True
 
     def drop_table(self, table: str) -> bool:
@@ -292,7 +1260,7 @@ class Model:
         Returns:
         bool: True if the table was successfully dropped, False otherwise.
         """
-        conn, cur = self.connect()
+        conn, cur = self.connect(operation="drop_table")
         
         if conn is None or cur is None:
             return False
@@ -308,6 +1276,7 @@ class Model:
         cur.close()
         conn.close()
 
+        self.invalidate(SCHEMA_CHANGE)
         return True
 
     def generate_random_data(self, table: str, columns: list, data_types: list, parameters: list, rows_number: int, text_len=1) -> bool:
@@ -376,7 +1345,7 @@ class Model:
                 1),'''
 
         # Establish connection to the database
-        conn, cur = self.connect()
+        conn, cur = self.connect(operation="generate_random_data")
         
         if conn is None or cur is None:
             return False
@@ -439,8 +1408,367 @@ class Model:
         cur.close()
         conn.close()
 
+        self.invalidate(table)
+        return True
+
+    def copy_random_data(self, table: str, columns: list, data_types: list, parameters: list, rows_number: int, text_len=1, seed=None, batch_size=100000) -> bool:
+        """
+        This method is used to generate random data on the client with NumPy and load it into a specific table with COPY.
+
+        Unlike generate_random_data it is not limited to distributions expressible in one SQL expression:
+        besides the types of generate_random_data it supports float, normal, zipf and categorical columns
+        (see generator.generate_column). Rows are generated and sent in batches; the batches are encoded
+        in the binary COPY format, or in the text format if a target column type has no binary encoder.
+        Foreign key values are sampled from the parent keys that exist when the load starts.
+
+        Parameters:
+        table (str): The name of the table where the data will be inserted.
+        columns (list): A list of column names where the data will be inserted.
+        data_types (list): A list of generator types(in str) corresponding to the columns.
+        parameters (list): A list of tuples, each containing the parameters for the random data.
+        rows_number (int): The number of rows of data to be generated and inserted.
+        text_len (int, optional): The length of the text to be generated. Ignored if data_type is not text.
+        seed (int, optional): The seed of the random generator. Runs with the same seed produce the same data.
+        batch_size (int, optional): The number of rows generated and sent per COPY.
+
+        Returns:
+        bool: True if the data was successfully generated and inserted, False otherwise.
+        """
+        conn, cur = self.connect(operation="copy_random_data")
+
+        if conn is None or cur is None:
+            return False
+
+        try:
+            # Look up the target column types, they decide how the values are encoded
+            column_types = self.column_types(cur, table)
+            for column in columns:
+                if column not in column_types:
+                    raise ValueError(f"Column '{column}' does not exist in {table}")
+            pg_types = [column_types[column] for column in columns]
+
+            # Load every referenced parent key once instead of querying it per row
+            fk_pools = {}
+            for i, (parameter, data_type) in enumerate(zip(parameters, data_types)):
+                if data_type == 'fk_int':
+                    parent_table, parent_column = parameter
+                    cur.execute(f"SELECT DISTINCT {parent_column} FROM {parent_table}")
+                    fk_pools[i] = np.array([row[0] for row in cur.fetchall()])
+
+            rng = np.random.default_rng(seed)
+            columns_str = ', '.join(columns)
+
+            remaining = rows_number
+            while remaining > 0:
+                size = min(batch_size, remaining)
+                batch, binary = generator.build_copy_batch(rng, data_types, parameters, pg_types, size, text_len, fk_pools)
+                copy_format = "binary" if binary else "text"
+                # COPY does not support wait callbacks, Ctrl-C is handled between batches
+                with blocking_wait():
+                    cur.copy_expert(f"COPY {table} ({columns_str}) FROM STDIN WITH (FORMAT {copy_format})", io.BytesIO(batch))
+                remaining -= size
+        except Exception as e:
+            print("Error: Invalid random data copy\n", e)
+            return False
+
+        # Commit the transaction and close the connection
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        self.invalidate(table)
         return True
 
+    def create_search_index(self, table: str, column: str, kind: str = "trigram") -> bool:
+        """
+        This method is used to create an index that lets a text column be searched without a full table scan.
+
+        Parameters:
+        table (str): The name of the table.
+        column (str): The name of the text column to be indexed.
+        kind (str, optional): The type of the index. Possible values:
+            - trigram: pg_trgm GIN index, used by substring (LIKE '%...%') searches
+            - fulltext: GIN index on the tsvector of the column, used by full-text searches
+
+        Returns:
+        bool: True if the index was successfully created, False otherwise.
+        """
+        conn, cur = self.connect(operation="create_search_index")
+
+        if conn is None or cur is None:
+            return False
+
+        try:
+            # Quoted, so that names such as "order" give a valid index name
+            name = f"{normalize_table(table)}_{normalize_table(column)}"
+            if kind == "trigram":
+                cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                index = f'"{name}_trgm_idx"'
+                query = f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin ({column} gin_trgm_ops)"
+            elif kind == "fulltext":
+                index = f'"{name}_fts_idx"'
+                query = f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin (to_tsvector('{SEARCH_CONFIG}', {column}))"
+            else:
+                print(f"Error: Unsupported search index type '{kind}'")
+                return False
+            cur.execute(query)
+        except Exception as e:
+            print("Error: Invalid search index creation\n", e)
+            return False
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        return True
+
+    def get_search_index(self, table: str, column: str) -> Union[str, None]:
+        """
+        This method is used to find out which kind of search index exists on a text column.
+
+        Parameters:
+        table (str): The name of the table.
+        column (str): The name of the column.
+
+        Returns:
+        str or None: "fulltext" or "trigram" (full-text is preferred if both exist), or None if the column has no search index.
+        """
+        conn, cur = self.connect(read_only=True, operation="get_search_index")
+
+        if conn is None or cur is None:
+            return None
+
+        try:
+            cur.execute(SEARCH_INDEX_QUERY, {
+                "table": table,
+                "column": normalize_table(column),  # Same case folding as table names
+                "fulltext": f"to_tsvector('{SEARCH_CONFIG}'::regconfig, %",
+            })
+            row = cur.fetchone()
+        except Exception as e:
+            print("Error: Invalid search index get\n", e)
+            return None
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        if row is None:
+            # The column does not exist
+            return None
+        if row[0]:
+            return "fulltext"
+        if row[1]:
+            return "trigram"
+        return None
+
+    def search_data(self, table: str, column: str, text: str, kind: str, limit: int = 100) -> Union[List[Tuple], None]:
+        """
+        This method is used to search a text column through its search index, best matches first.
+
+        Parameters:
+        table (str): The name of the table.
+        column (str): The name of the text column.
+        text (str): The text to search for.
+        kind (str): The kind of search index on the column (see get_search_index). Possible values:
+            - trigram: rows containing the text, ranked by trigram similarity
+            - fulltext: rows matching the words of the text, ranked by ts_rank
+        limit (int, optional): The maximum number of rows returned.
+
+        Returns:
+        data (list or None): A list of tuples (value, rank).
+        None: If there is an error in connection or execution, or if nothing matches.
+        """
+        conn, cur = self.connect(read_only=True, operation="search_data")
+
+        if conn is None or cur is None:
+            return None
+
+        try:
+            if kind == "trigram":
+                # Same substring match as Find Data's LIKE, which the trigram index can serve
+                pattern = f"%{text}%"
+                query = f"""
+                SELECT {column}, similarity({column}, %s) AS rank
+                FROM {table}
+                WHERE {column} LIKE %s
+                ORDER BY rank DESC
+                LIMIT %s
+                """
+                cur.execute(query, (text, pattern, limit))
+            elif kind == "fulltext":
+                # The expression must match the index definition for the index to be used
+                query = f"""
+                SELECT {column}, ts_rank(to_tsvector('{SEARCH_CONFIG}', {column}), query) AS rank
+                FROM {table}, plainto_tsquery('{SEARCH_CONFIG}', %s) AS query
+                WHERE to_tsvector('{SEARCH_CONFIG}', {column}) @@ query
+                ORDER BY rank DESC
+                LIMIT %s
+                """
+                cur.execute(query, (text, limit))
+            else:
+                print(f"Error: Unsupported search index type '{kind}'")
+                return None
+            data = cur.fetchall()
+        except Exception as e:
+            print("Error: Invalid data search\n", e)
+            return None
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        if len(data) == 0:
+            return None
+
+        return data
+
+    def explain(self, query: str, analyze: bool = False) -> Union[dict, None]:
+        """
+        This method is used to retrieve the execution plan of a query.
+
+        Parameters:
+        query (str): The query to be explained, e.g. from get_data_query or an analytics *_query method.
+        analyze (bool, optional): If True, run the query (EXPLAIN ANALYZE) and include actual rows and times. Defaults to False.
+
+        Returns:
+        plan (dict or None): The root node of the plan as returned by EXPLAIN (FORMAT JSON), with child nodes under "Plans".
+        None: If there is an error in connection or execution.
+        """
+        conn, cur = self.connect(read_only=True, operation="explain")
+
+        if conn is None or cur is None:
+            return None
+
+        try:
+            options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+            cur.execute(f"EXPLAIN ({options}) {query}")
+            plan = cur.fetchone()[0][0]["Plan"]
+        except Exception as e:
+            print("Error: Invalid query explain\n", e)
+            return None
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        return plan
+
+    def aggregate_sharded(self, shard_query: Callable[[Tuple[int, int]], str], operation: str, key_columns: int = 2, min_lsn: Optional[str] = None) -> Union[List[Tuple], None]:
+        """
+        This method is used to run an aggregation over "order" split into id ranges, one connection per range.
+
+        The id range of "order" is split into self.shards equal ranges and the aggregation query of each
+        range runs on its own connection in a thread pool. The partial rows are merged by their key columns,
+        adding up the remaining (COUNT and SUM) columns. All shards import the snapshot exported by the
+        coordinating transaction, so they see the same data and the result is the same as the single query.
+
+        Parameters:
+        shard_query (callable): Builds the aggregation query of an id range [start, end).
+        operation (str): The name of the calling method, used to pick its statement timeout.
+        key_columns (int, optional): The number of leading columns identifying a group.
+        min_lsn (str, optional): A WAL position of the primary the aggregation must see (see connect).
+
+        Returns:
+        data (list or None): A list of tuples representing the merged rows, ordered by key.
+        None: If there is an error in connection or execution.
+        """
+        # Coordinator: pick the server and export a snapshot for the shards
+        conn, dsn = self.connect_replica(operation, min_lsn) if self.replicas else (None, None)
+        try:
+            if conn is None:
+                dsn = self.dsn
+                conn = psycopg2.connect(dsn, options=self.connection_options(operation))
+        except psycopg2.OperationalError as e:
+            print("Unable to connect to the database\n", e)
+            return None
+
+        shard_conns = []
+
+        def run_shard(bounds: Tuple[int, int]) -> list:
+            shard_conn = psycopg2.connect(dsn, options=self.connection_options(operation))
+            shard_conns.append(shard_conn)
+            shard_conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            with shard_conn.cursor() as shard_cur:
+                shard_cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                shard_cur.execute(shard_query(bounds))
+                rows = shard_cur.fetchall()
+            shard_conn.commit()
+            return rows
+
+        try:
+            conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            cur = conn.cursor()
+            cur.execute('SELECT pg_export_snapshot(), MIN(id), MAX(id) FROM "order"')
+            snapshot, low, high = cur.fetchone()
+            if low is None:
+                # "order" is empty
+                conn.commit()
+                return []
+
+            step = -(-(high - low + 1) // self.shards)
+            bounds = [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+            merged = {}
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+                try:
+                    partials = list(executor.map(run_shard, bounds))
+                except KeyboardInterrupt:
+                    # Worker threads do not see Ctrl-C, cancel their queries on the server
+                    for shard_conn in shard_conns:
+                        shard_conn.cancel()
+                    raise
+
+            for rows in partials:
+                for row in rows:
+                    key, values = row[:key_columns], row[key_columns:]
+                    if key in merged:
+                        merged[key] = [a if b is None else b if a is None else a + b for a, b in zip(merged[key], values)]
+                    else:
+                        merged[key] = list(values)
+
+            conn.commit()
+        except Exception as e:
+            print("Error: Invalid sharded aggregation\n", e)
+            return None
+        finally:
+            # Also on Ctrl-C, so that no connection is left open in its transaction
+            for shard_conn in shard_conns:
+                shard_conn.close()
+            conn.close()
+
+        return [key + tuple(values) for key, values in sorted(merged.items(), key=lambda item: item[0])]
+
+    def pay_systems_total_income_query(self, left: int, right: int, shard: Optional[Tuple[int, int]] = None) -> str:
+        """
+        This method is used to build the query executed by pay_systems_total_income.
+
+        Parameters:
+        left (int): The left bound of the sum of the orders.
+        right (int): The right bound of the sum of the orders.
+
+        shard (tuple, optional): Only aggregate orders with id in [shard[0], shard[1]) (see aggregate_sharded).
+
+        Returns:
+        str: The SQL query.
+        """
+        shard_str = f' AND "order".id >= {shard[0]} AND "order".id < {shard[1]}' if shard is not None else ''
+        return f'''
+        SELECT
+            pay_system.id,
+            pay_system.name,
+            COUNT(*) AS Count,
+            SUM("order".sum) AS total
+        FROM
+            "order"
+            INNER JOIN pay_system ON "order".pay_system_id = pay_system.id
+        WHERE
+            sum BETWEEN {left} AND {right}{shard_str}
+        GROUP BY
+            pay_system.id,
+            pay_system.name;
+        '''
+
     def pay_systems_total_income(self, left: int, right: int) -> Union[List[Tuple], None]:
         """
         This method is used to retrieve the total income of each pay system in the database.
@@ -453,28 +1781,32 @@ class Model:
         data (list or None): A list of tuples representing the rows of data retrieved from the database.
         If there is an error in connection or execution, it returns None.
         """
-        
-        conn, cur = self.connect()
+        key = ("pay_systems_total_income", left, right)
+        cached = self.cache_get(key)
+        if cached is not None:
+            return cached
+        generation = self.cache_generation
+
+        query = self.pay_systems_total_income_query(left, right)
+        data, marker, lsn = self.result_cache_get(query, ["order", "pay_system"])
+        if data is not None:
+            self.cache_put(key, ['"order"', "pay_system"], data, generation)
+            return data
+
+        if self.shards > 1:
+            data = self.aggregate_sharded(lambda shard: self.pay_systems_total_income_query(left, right, shard), "pay_systems_total_income", min_lsn=later_lsn(lsn, self.cache_min_lsn(['"order"', "pay_system"])))
+            if data is None:
+                return None
+            self.result_cache_put(query, marker, data)
+            self.cache_put(key, ['"order"', "pay_system"], data, generation)
+            return data
+
+        conn, cur = self.connect(read_only=True, operation="pay_systems_total_income", min_lsn=later_lsn(lsn, self.cache_min_lsn(['"order"', "pay_system"])))
         
         if conn is None or cur is None:
             return None
         
         try:
-            query = f'''
-            SELECT
-                pay_system.id,
-                pay_system.name,
-                COUNT(*) AS Count,
-                SUM("order".sum) AS total
-            FROM
-                "order"
-                INNER JOIN pay_system ON "order".pay_system_id = pay_system.id
-            WHERE
-                sum BETWEEN {left} AND {right}
-            GROUP BY
-                pay_system.id,
-                pay_system.name;
-            '''
             cur.execute(query)
             data = cur.fetchall()
         except Exception as e:
@@ -485,8 +1817,39 @@ class Model:
         cur.close()
         conn.close()
 
+        self.result_cache_put(query, marker, data)
+        self.cache_put(key, ['"order"', "pay_system"], data, generation)
         return data
     
+    def company_orders_thru_period_query(self, left: str, right: str, shard: Optional[Tuple[int, int]] = None) -> str:
+        """
+        This method is used to build the query executed by company_orders_thru_period.
+
+        Parameters:
+        left (str): The left bound of the period.
+        right (str): The right bound of the period.
+
+        shard (tuple, optional): Only aggregate orders with id in [shard[0], shard[1]) (see aggregate_sharded).
+
+        Returns:
+        str: The SQL query.
+        """
+        shard_str = f' AND "order".id >= {shard[0]} AND "order".id < {shard[1]}' if shard is not None else ''
+        return f'''
+        SELECT
+            company.id,
+            company.name,
+            COUNT(*) AS Count
+        FROM
+            "order"
+            INNER JOIN company ON "order".company_id = company.id
+        WHERE
+            "order".date BETWEEN '{left}' AND '{right}'{shard_str}
+        GROUP BY
+            company.id,
+            company.name;
+        '''
+
     def company_orders_thru_period(self, left: str, right: str) -> Union[List[Tuple], None]:
         """
         This method is used to retrieve the number of orders placed by each company in the database.
@@ -499,27 +1862,32 @@ class Model:
         data (list or None): A list of tuples representing the rows of data retrieved from the database.
         If there is an error in connection or execution, it returns None.
         """
-        
-        conn, cur = self.connect()
+        key = ("company_orders_thru_period", left, right)
+        cached = self.cache_get(key)
+        if cached is not None:
+            return cached
+        generation = self.cache_generation
+
+        query = self.company_orders_thru_period_query(left, right)
+        data, marker, lsn = self.result_cache_get(query, ["order", "company"])
+        if data is not None:
+            self.cache_put(key, ['"order"', "company"], data, generation)
+            return data
+
+        if self.shards > 1:
+            data = self.aggregate_sharded(lambda shard: self.company_orders_thru_period_query(left, right, shard), "company_orders_thru_period", min_lsn=later_lsn(lsn, self.cache_min_lsn(['"order"', "company"])))
+            if data is None:
+                return None
+            self.result_cache_put(query, marker, data)
+            self.cache_put(key, ['"order"', "company"], data, generation)
+            return data
+
+        conn, cur = self.connect(read_only=True, operation="company_orders_thru_period", min_lsn=later_lsn(lsn, self.cache_min_lsn(['"order"', "company"])))
         
         if conn is None or cur is None:
             return None
         
         try:
-            query = f'''
-            SELECT
-                company.id,
-                company.name,
-                COUNT(*) AS Count
-            FROM
-                "order"
-                INNER JOIN company ON "order".company_id = company.id
-            WHERE
-                "order".date BETWEEN '{left}' AND '{right}'
-            GROUP BY
-                company.id,
-                company.name;
-            '''
             cur.execute(query)
             data = cur.fetchall()
         except Exception as e:
@@ -530,8 +1898,35 @@ class Model:
         cur.close()
         conn.close()
 
+        self.result_cache_put(query, marker, data)
+        self.cache_put(key, ['"order"', "company"], data, generation)
         return data
     
+    def top_5_orders_total_price_query(self, company: str) -> str:
+        """
+        This method is used to build the query executed by top_5_orders_total_price.
+
+        Parameters:
+        company (str): The name of the company.
+
+        Returns:
+        str: The SQL query.
+        """
+        return f'''
+        SELECT
+            "order".id,
+            "order".sum
+        FROM
+            "order"
+            INNER JOIN company ON "order".company_id = company.id
+        WHERE
+            company.name = '{company}'
+        ORDER BY
+            "order".sum DESC
+        LIMIT
+            5;
+        '''
+
     def top_5_orders_total_price(self, company: str) -> Union[List[Tuple], None]:
         """
         This method is used to retrieve the top 5 orders with the highest total price for a specific company.
@@ -543,27 +1938,24 @@ class Model:
         data (list or None): A list of tuples representing the rows of data retrieved from the database.
         If there is an error in connection or execution, it returns None.
         """
-        
-        conn, cur = self.connect()
+        key = ("top_5_orders_total_price", company)
+        cached = self.cache_get(key)
+        if cached is not None:
+            return cached
+        generation = self.cache_generation
+
+        query = self.top_5_orders_total_price_query(company)
+        data, marker, lsn = self.result_cache_get(query, ["order", "company"])
+        if data is not None:
+            self.cache_put(key, ['"order"', "company"], data, generation)
+            return data
+
+        conn, cur = self.connect(read_only=True, operation="top_5_orders_total_price", min_lsn=later_lsn(lsn, self.cache_min_lsn(['"order"', "company"])))
         
         if conn is None or cur is None:
             return None
         
         try:
-            query = f'''
-            SELECT
-                "order".id,
-                "order".sum
-            FROM
-                "order"
-                INNER JOIN company ON "order".company_id = company.id
-            WHERE
-                company.name = '{company}'
-            ORDER BY
-                "order".sum DESC
-            LIMIT
-                5;
-            '''
             cur.execute(query)
             data = cur.fetchall()
         except Exception as e:
@@ -574,4 +1966,7 @@ class Model:
         cur.close()
         conn.close()
 
+        self.result_cache_put(query, marker, data)
+        self.cache_put(key, ['"order"', "company"], data, generation)
         return data
+
@@ -0,0 +1,106 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+class ResultCache:
+    def __init__(self, directory: str = "cache", max_bytes: int = 64 * 1024 * 1024):
+        """
+        This is the constructor method for the class. It opens (or creates) the SQLite cache file in the directory.
+
+        Each entry is a pickled query result stored with a change marker of the tables it was computed
+        from. An entry is only returned while the caller's current marker is the same, and the least
+        recently used entries are evicted when the total size exceeds max_bytes. Errors of the cache
+        file (e.g. locked by another instance) and unreadable entries are treated as misses.
+
+        Parameters:
+        directory (str, optional): The directory of the cache file.
+        max_bytes (int, optional): The maximum total size of the cached results in bytes.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "results.sqlite3")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, marker TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, key: str, marker: str) -> Optional[Any]:
+        """
+        This method is used to look up a cached result.
+
+        Parameters:
+        key (str): The query and its parameters.
+        marker (str): The current change marker of the tables the query reads.
+
+        Returns:
+        The cached result, or None if there is none or it was computed before the tables changed.
+        """
+        with self.lock:
+            try:
+                row = self.conn.execute("SELECT marker, value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[0] != marker:
+                    # The data changed since the result was computed, it will never be valid again
+                    self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self.conn.commit()
+                    return None
+                value = pickle.loads(row[1])
+                self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+                return value
+            except Exception as e:
+                # A corrupted entry is replaced by the next put of the same key
+                self.rollback()
+                print("Warning: Result cache get failed\n", e)
+                return None
+
+    def put(self, key: str, marker: str, value: Any):
+        """
+        This method is used to store a result and evict the least recently used entries if the cache is too big.
+
+        Parameters:
+        key (str): The query and its parameters.
+        marker (str): The change marker read before the query was executed.
+        value: The result.
+        """
+        with self.lock:
+            try:
+                blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                if len(blob) > self.max_bytes:
+                    return
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, marker, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, marker, blob, len(blob), time.time()),
+                )
+                total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                for old_key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self.conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                    total -= size
+                self.conn.commit()
+            except Exception as e:
+                self.rollback()
+                print("Warning: Result cache put failed\n", e)
+
+    def rollback(self):
+        # Discard the failed transaction so that the next call starts clean
+        try:
+            self.conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        """
+        This method is used to remove all cached results.
+        """
+        with self.lock:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.commit()
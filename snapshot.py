@@ -0,0 +1,331 @@
+import json
+import os
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from model import Model
+
+# Columns of "order" kept in the snapshot and their on-disk dtypes
+ORDER_COLUMNS = {
+    "id": "<i8",
+    "company_id": "<i8",
+    "pay_system_id": "<i8",
+    "sum": "<f8",
+    "date": "<M8[D]",
+}
+
+class OrderSnapshot:
+    def __init__(self, model: Model, directory: str = "snapshot", batch_size: int = 100000, safety_margin: int = 10000):
+        """
+        This is the constructor method for the class. It opens the snapshot stored in the directory, if there is one.
+
+        The snapshot keeps the columns of "order" in memory-mapped files (one file per column)
+        together with the names of companies and pay systems, and answers the analytics queries
+        of Model with NumPy instead of the database.
+
+        Parameters:
+        model (Model): The model used to read from the database.
+        directory (str, optional): The directory where the snapshot files are stored.
+        batch_size (int, optional): The number of rows fetched from the database per round trip.
+        safety_margin (int, optional): The number of ids below the watermark pulled again by each refresh,
+        for orders whose transactions committed out of id order.
+        """
+        self.model = model
+        self.directory = directory
+        self.batch_size = batch_size
+        self.safety_margin = safety_margin
+        self.watermark = 0
+        self.rows = 0
+        self.counters = None
+        self.companies = {}
+        self.pay_systems = {}
+        self.columns = {}
+        self.load()
+
+    def column_path(self, column: str) -> str:
+        return os.path.join(self.directory, f"order.{column}.bin")
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def load(self):
+        """
+        This method is used to open the snapshot files and map the columns into memory.
+        """
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.watermark = meta["watermark"]
+            self.rows = meta["rows"]
+            self.counters = meta.get("counters")
+            self.companies = {int(key): value for key, value in meta["companies"].items()}
+            self.pay_systems = {int(key): value for key, value in meta["pay_systems"].items()}
+
+        for column, dtype in ORDER_COLUMNS.items():
+            # Rows beyond the metadata row count belong to an interrupted refresh and are ignored
+            if self.rows > 0 and os.path.exists(self.column_path(column)):
+                self.columns[column] = np.memmap(self.column_path(column), dtype=dtype, mode="r", shape=(self.rows,))
+            else:
+                self.columns[column] = np.empty(0, dtype=dtype)
+
+    def save_meta(self):
+        meta = {
+            "watermark": self.watermark,
+            "rows": self.rows,
+            "counters": self.counters,
+            "companies": self.companies,
+            "pay_systems": self.pay_systems,
+        }
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def change_counters(self) -> Tuple[Optional[list], Optional[str]]:
+        """
+        This method is used to read the counters that change when orders are updated, deleted or truncated.
+
+        They are read from the primary, where the statistics are kept. The counters only change when the
+        writing session reports its statistics, not at commit: on PostgreSQL 15 and later within about
+        10 seconds for an idle session and up to 60 seconds under lock contention. A refresh in that
+        window misses the change until a later refresh sees the counters move.
+
+        The primary's WAL position is read with them: the orders must be pulled from a server that has
+        replayed it, otherwise the snapshot could miss a change the stored counters already include.
+
+        Returns:
+        (list or None, str or None): The relation file node and the update and delete counters of "order",
+        and the WAL position, or None and None if there is an error in connection or execution.
+        """
+        conn, cur = self.model.connect(operation="snapshot_refresh")
+
+        if conn is None or cur is None:
+            return None, None
+
+        try:
+            cur.execute(
+                "SELECT pg_relation_filenode(relid), n_tup_upd, n_tup_del "
+                "FROM pg_stat_user_tables WHERE schemaname = 'public' AND relname = 'order'"
+            )
+            row = cur.fetchone()
+            # Read after the counters, so every change they count is before this position
+            cur.execute("SELECT pg_current_wal_lsn()")
+            lsn = cur.fetchone()[0]
+        except Exception as e:
+            print("Error: Invalid snapshot refresh\n", e)
+            return None, None
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        return (list(row) if row is not None else []), lsn
+
+    def refresh(self, full: bool = False) -> Union[int, None]:
+        """
+        This method is used to bring the snapshot up to date with the database.
+
+        Orders with an id above the watermark (the highest id already in the snapshot) minus safety_margin
+        are pulled, and those not in the snapshot yet are appended. The snapshot is rebuilt from scratch
+        instead if orders were updated, deleted or truncated since the last refresh (see change_counters),
+        or if the number of orders up to the new watermark differs from the snapshot, which means orders
+        committed further out of id order than the margin were missed.
+        Company and pay system names are always reloaded.
+
+        Parameters:
+        full (bool, optional): If True, discard the snapshot and pull all orders. Defaults to False.
+
+        Returns:
+        int or None: The number of orders added to the snapshot, or None if there is an error in connection or execution.
+        """
+        counters, lsn = self.change_counters()
+        if counters is None:
+            return None
+        if self.counters != counters:
+            full = True
+
+        pulled = self.pull(full, lsn)
+        if pulled is False:
+            pulled = self.pull(True, lsn)
+        if pulled is None or pulled is False:
+            return None
+
+        self.counters = counters
+        self.save_meta()
+        return pulled
+
+    def pull(self, full: bool, min_lsn: Optional[str] = None) -> Union[int, bool, None]:
+        """
+        This method is used to pull orders into the snapshot files (see refresh).
+
+        Parameters:
+        full (bool): If True, write a new snapshot with all orders, otherwise append the orders above the watermark.
+        min_lsn (str, optional): A WAL position of the primary the orders must be read at (see Model.connect).
+
+        Returns:
+        int, bool or None: The number of orders added, False if the snapshot does not match the database
+        and must be rebuilt, or None if there is an error in connection or execution.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        rows = 0 if full else self.rows
+        watermark = 0 if full else self.watermark
+
+        # Orders just below the watermark are pulled again, those already in the snapshot are skipped
+        low = None if full else watermark - self.safety_margin
+        known = np.empty(0, dtype="<i8") if full else self.columns["id"][self.columns["id"] > low]
+
+        conn, cur = self.model.connect(read_only=True, operation="snapshot_refresh", min_lsn=min_lsn)
+
+        if conn is None or cur is None:
+            return None
+
+        # A full refresh is written next to the current files, which stay mapped until it succeeds
+        suffix = ".new" if full else ""
+        files = {}
+        pulled = 0
+        try:
+            # All queries see the same data, so the count below matches the pulled orders
+            conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            cur.execute("SELECT id, name FROM company")
+            companies = {row[0]: row[1] for row in cur.fetchall()}
+            cur.execute("SELECT id, name FROM pay_system")
+            pay_systems = {row[0]: row[1] for row in cur.fetchall()}
+
+            for column, dtype in ORDER_COLUMNS.items():
+                files[column] = open(self.column_path(column) + suffix, "a+b")
+                # Drop the tail of an interrupted refresh before appending
+                files[column].truncate(rows * np.dtype(dtype).itemsize)
+
+            # Server-side cursor, rows arrive in batches instead of all at once
+            order_cur = conn.cursor(name="order_snapshot")
+            order_cur.itersize = self.batch_size
+            order_cur.execute(
+                'SELECT id, company_id, pay_system_id, sum, date FROM "order" WHERE %s IS NULL OR id > %s ORDER BY id',
+                (low, low),
+            )
+            while True:
+                batch = order_cur.fetchmany(self.batch_size)
+                if not batch:
+                    break
+                ids, company_ids, pay_system_ids, sums, dates = zip(*batch)
+                arrays = {
+                    "id": np.array(ids, dtype="<i8"),
+                    "company_id": np.array([-1 if value is None else value for value in company_ids], dtype="<i8"),
+                    "pay_system_id": np.array([-1 if value is None else value for value in pay_system_ids], dtype="<i8"),
+                    "sum": np.array([np.nan if value is None else float(value) for value in sums], dtype="<f8"),
+                    "date": np.array(dates, dtype="<M8[D]"),
+                }
+                watermark = max(watermark, int(arrays["id"][-1]))
+                new = ~np.isin(arrays["id"], known)
+                for column, values in arrays.items():
+                    files[column].write(values[new].tobytes())
+                pulled += int(new.sum())
+            order_cur.close()
+
+            if not full:
+                cur.execute('SELECT COUNT(*) FROM "order" WHERE id <= %s', (watermark,))
+                if cur.fetchone()[0] != rows + pulled:
+                    # The appended tail is dropped by the next refresh, the metadata still ends before it
+                    return False
+        except Exception as e:
+            print("Error: Invalid snapshot refresh\n", e)
+            return None
+        finally:
+            for f in files.values():
+                f.close()
+            conn.close()
+
+        if full:
+            self.columns = {}
+            for column in ORDER_COLUMNS:
+                os.replace(self.column_path(column) + suffix, self.column_path(column))
+
+        # Metadata is written last, so an interrupted refresh leaves the previous snapshot valid
+        self.rows = rows + pulled
+        self.watermark = watermark
+        self.companies = companies
+        self.pay_systems = pay_systems
+        self.save_meta()
+        self.load()
+
+        return pulled
+
+    def pay_systems_total_income(self, left: Union[int, str], right: Union[int, str]) -> Union[List[Tuple], None]:
+        """
+        This method is used to compute the count and total income of orders per pay system from the snapshot.
+        Same result as Model.pay_systems_total_income.
+
+        Parameters:
+        left (int): The left bound of the sum of the orders.
+        right (int): The right bound of the sum of the orders.
+
+        Returns:
+        data (list or None): A list of tuples (id, name, count, total), or None if the bounds are invalid.
+        """
+        try:
+            left, right = float(left), float(right)
+        except ValueError as e:
+            print("Error: Invalid snapshot query\n", e)
+            return None
+
+        sums = self.columns["sum"]
+        mask = (sums >= left) & (sums <= right)
+        return self._grouped(self.columns["pay_system_id"][mask], self.pay_systems, sums[mask])
+
+    def company_orders_thru_period(self, left: str, right: str) -> Union[List[Tuple], None]:
+        """
+        This method is used to count the orders of each company placed within a period from the snapshot.
+        Same result as Model.company_orders_thru_period.
+
+        Parameters:
+        left (str): The left bound of the period (YYYY-MM-DD).
+        right (str): The right bound of the period (YYYY-MM-DD).
+
+        Returns:
+        data (list or None): A list of tuples (id, name, count), or None if the bounds are invalid.
+        """
+        try:
+            left, right = np.datetime64(left, "D"), np.datetime64(right, "D")
+        except ValueError as e:
+            print("Error: Invalid snapshot query\n", e)
+            return None
+
+        dates = self.columns["date"]
+        mask = (dates >= left) & (dates <= right)
+        return self._grouped(self.columns["company_id"][mask], self.companies)
+
+    def top_5_orders_total_price(self, company: str) -> List[Tuple]:
+        """
+        This method is used to find the 5 orders with the highest total price of a company from the snapshot.
+        Same result as Model.top_5_orders_total_price.
+
+        Parameters:
+        company (str): The name of the company.
+
+        Returns:
+        data (list): A list of tuples (order id, total price), highest price first.
+        """
+        company_ids = [key for key, name in self.companies.items() if name == company]
+        mask = np.isin(self.columns["company_id"], company_ids) & ~np.isnan(self.columns["sum"])
+        ids = self.columns["id"][mask]
+        sums = self.columns["sum"][mask]
+
+        top = np.argsort(-sums, kind="stable")[:5]
+        return [(int(ids[i]), float(sums[i])) for i in top]
+
+    def _grouped(self, keys: np.ndarray, names: dict, weights: Optional[np.ndarray] = None) -> List[Tuple]:
+        # Group by key with counts (and sums of weights), keeping only keys that exist in the names table
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique))
+        totals = np.bincount(inverse, weights=np.nan_to_num(weights), minlength=len(unique)) if weights is not None else None
+
+        data = []
+        for i, key in enumerate(unique.tolist()):
+            if key not in names:
+                continue
+            row = (key, names[key], int(counts[i]))
+            if totals is not None:
+                row += (float(totals[i]),)
+            data.append(row)
+        return data
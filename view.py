@@ -10,8 +10,29 @@ class View:
         
     # Display tabular data in a formatted table using 'tabulate'
     def show_data(self, data, columns):
+        if isinstance(data, dict):
+            # Columnar data (Model.get_data with columnar=True) is keyed by column name
+            print(tabulate(data, headers="keys", tablefmt="psql"))
+            return
         print(tabulate(data, headers=columns, tablefmt="psql"))
         
+    # Display an execution plan as an indented tree of nodes
+    def show_plan(self, plan, depth=0):
+        node = plan["Node Type"]
+        if "Relation Name" in plan:
+            node += f" on {plan['Relation Name']}"
+        if "Index Name" in plan:
+            node += f" using {plan['Index Name']}"
+        line = f"{'  ' * depth}-> {node}  (cost={plan['Startup Cost']:.2f}..{plan['Total Cost']:.2f} rows={plan['Plan Rows']})"
+        if "Actual Rows" in plan:
+            line += f"  (actual time={plan['Actual Total Time']:.3f}ms rows={plan['Actual Rows']} loops={plan['Actual Loops']})"
+        print(line)
+        for key in ("Filter", "Index Cond", "Hash Cond", "Join Filter"):
+            if key in plan:
+                print(f"{'  ' * depth}     {key}: {plan[key]}")
+        for child in plan.get("Plans", []):
+            self.show_plan(child, depth + 1)
+        
     # Get input from the user for inserting data into a table
     def get_insert_input(self):
         table = input("Enter table name: ")
@@ -43,6 +64,39 @@ class View:
             condition = None
         return condition
     
+    # Ask the user to confirm an action
+    def get_confirmation(self, message):
+        return input(message)
+    
+    # Get input from the user for deleting data in batches
+    def get_batched_delete_input(self):
+        # Prompt for the batch size, with a single DELETE if not provided
+        batch_size = input("Enter batch size (leave empty to delete in one statement): ")
+        if batch_size == "":
+            return None, None
+        try:
+            batch_size = int(batch_size)
+        except ValueError:
+            raise ValueError("Batch size must be integer!")
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1!")
+        
+        # Prompt for the maximum delete rate, unlimited if not provided
+        max_rows_per_sec = input("Enter maximum rows per second (leave empty for no limit): ")
+        try:
+            max_rows_per_sec = float(max_rows_per_sec) if max_rows_per_sec != "" else None
+        except ValueError:
+            raise ValueError("Rows per second must be a number!")
+        return batch_size, max_rows_per_sec
+    
+    # Get the explain mode from the user
+    def get_explain_mode_input(self):
+        # Prompt for the mode, analyze runs every query twice: once under EXPLAIN ANALYZE and once for its result
+        mode = input("Enter explain mode (off, plan, analyze - runs each query twice, doubling its cost): ")
+        if mode not in ("off", "plan", "analyze"):
+            raise ValueError("Explain mode must be off, plan or analyze!")
+        return mode
+    
     # Get input from the user for updating data in a table
     def get_update_input(self):
         # Prompt for the table name
@@ -58,6 +112,19 @@ class View:
             condition = None
         return table, data, condition
     
+    # Get input from the user for updating many rows from a file
+    def get_bulk_update_input(self):
+        # Prompt for the table name and the column identifying the rows
+        table = input("Enter table name: ")
+        key = input("Enter key column: ")
+        
+        # Prompt for the file with the new rows (CSV with a header row, or JSON lines)
+        path = input("Enter path to .csv or .jsonl file: ")
+        
+        # Prompt whether missing rows should be inserted
+        upsert = input("Insert rows whose key does not exist? (yes/no): ")
+        return table, key, path, upsert.lower() == "yes"
+    
     # Get input from the user for deleting data from a table
     def get_delete_input(self):
         # Prompt for the table name
@@ -121,6 +188,17 @@ class View:
         
         return table, columns, data_types, parameters, rows_number, text_len
     
+    # Get the seed for the vectorized random data generator
+    def get_seed_input(self):
+        # Prompt for the seed, with a random run if not provided
+        seed = input("Enter random seed (leave empty for a random run): ")
+        if seed == "":
+            return None
+        try:
+            return int(seed)
+        except ValueError:
+            raise ValueError("Seed must be integer!")
+    
     # Get input from the user for finding data based on specific conditions
     def get_find_input(self):
         # Prompt for the table name
@@ -129,8 +207,9 @@ class View:
         # Prompt for the column name
         column = input("Enter column name: ")
         
-        # Initialize condition as empty
+        # Initialize condition as empty, search is the raw text of a string search
         condition = ""
+        search = None
         
         # Prompt for the search type and build the condition accordingly
         t = input("Enter search type (number, string, boolean, date): ")
@@ -141,6 +220,7 @@ class View:
         elif t == "string":
             string = input("Enter regex string: ")
             condition = f"{column} LIKE '%{string}%'"
+            search = string
         elif t == "boolean":
             boolean = input("Enter boolean value (True, False): ")
             condition = f"{column} = {boolean}"
@@ -152,7 +232,17 @@ class View:
         # Default to None if no condition is created
         if condition == "":
             condition = None
-        return table, column, condition
+        return table, column, condition, search
+    
+    # Get input from the user for creating a search index
+    def get_search_index_input(self):
+        # Prompt for the table and the text column
+        table = input("Enter table name: ")
+        column = input("Enter column name: ")
+        
+        # Prompt for the index type
+        kind = input("Enter index type (trigram, fulltext): ")
+        return table, column, kind
     
     # Get input from the user to calculate total income for payment systems
     def get_pay_systems_total_income_input(self):